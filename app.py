@@ -3,27 +3,48 @@
 
 # Copyright Hersel Giannella
 
+import os
+
 from flask import Flask, send_from_directory
 from flask_login import LoginManager
+from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
-from models import db, bcrypt, User
+from server_config import check_profile
+from models import db, bcrypt
+from cache import get_user
+import instrumentation
+import images
+import assets
+import vendor_assets
+import export_static
+import db_routing
+from json_provider import FastJSONProvider
 from routes.home import route_home
 from routes.api import route_api
 from routes.auth import route_auth
 from routes.admin import route_admin
+from routes.seo import route_seo
 
 app = Flask(
     __name__,
     template_folder="templates",
     static_folder="static",
 )
+app.json = FastJSONProvider(app)  # orjson when installed
 
 # Load configuration
 app.config['SECRET_KEY'] = config.SECRET_KEY
 app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = instrumentation.instrument_pool(config.SQLALCHEMY_ENGINE_OPTIONS)
+app.config['SQLALCHEMY_BINDS'] = db_routing.replica_binds(config)  # Read replicas, same engine options
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
 app.config['SQLALCHEMY_ECHO'] = config.SQLALCHEMY_ECHO
 
+# Client IPs (login throttling) come from X-Forwarded-For when behind trusted proxies
+if config.TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.TRUSTED_PROXY_COUNT, x_proto=config.TRUSTED_PROXY_COUNT)
+
 # File upload configuration
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max file size
 app.config['UPLOAD_FOLDER'] = 'static/img'
@@ -31,7 +52,15 @@ app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 # Initialize extensions
 db.init_app(app)
+migrate = Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'),
+                  render_as_batch=config.DB_ENGINE == 'sqlite')
 bcrypt.init_app(app)
+instrumentation.init_app(app)
+images.init_app(app)
+assets.init_app(app)
+vendor_assets.init_app(app)
+export_static.init_app(app)
+db_routing.init_app(app)
 
 # Initialize Flask-Login
 login_manager = LoginManager()
@@ -42,27 +71,21 @@ login_manager.login_message_category = 'warning'
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user for Flask-Login"""
-    return User.query.get(int(user_id))
+    """Load user for Flask-Login from the short-TTL user cache"""
+    return get_user(int(user_id))
 
-# favicon.ico, sitemap.xml and robots.txt
+# favicon.ico (sitemap.xml and robots.txt are generated by routes/seo.py)
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory(app.static_folder, 'favicon.ico')
 
-@app.route('/sitemap.xml')
-def sitemap():
-    return send_from_directory(app.static_folder, 'sitemap.xml')
-
-@app.route('/robots.txt')
-def robots():
-    return send_from_directory(app.static_folder, 'robots.txt')
-
 # BluePrint Routes
 app.register_blueprint(route_home)
 app.register_blueprint(route_api)
 app.register_blueprint(route_auth)
 app.register_blueprint(route_admin)
+app.register_blueprint(route_seo)
 
 if __name__ == '__main__':
+    check_profile()
     app.run(debug=config.DEBUG, host=config.APP_HOST, port=config.APP_PORT)
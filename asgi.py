@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+ASGI entry point (hypercorn asgi:app)
+With ASGI_ASYNC_ROUTES enabled the public read routes (home, GET /api/..., sitemap.xml,
+robots.txt) are served by async handlers: cache hits are answered on the event loop and
+misses load their data through SQLAlchemy's asyncio extension (aiomysql) instead of
+occupying a worker thread. Every other request (admin, auth, writes, authenticated
+listings) goes to the Flask WSGI app on the thread pool.
+"""
+
+import asyncio
+import io
+import logging
+import random
+import weakref
+from urllib.parse import unquote
+
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from werkzeug.exceptions import HTTPException
+
+from config import config
+from app import app as flask_app
+from db_routing import use_replica
+import cache
+from cache import (content_version, peek_cached_body, peek_stale_body, store_cached_body, load_shared_body,
+                   cached_response, peek_snapshot, set_snapshot, load_snapshot)
+from routes import api, seo
+from routes.home import home_cache_key, render_home
+
+logger = logging.getLogger(__name__)
+
+wsgi = AsyncioWSGIMiddleware(flask_app)
+
+
+# ============================================================================
+# ASYNC DATABASE ACCESS
+# ============================================================================
+
+_session_factory = None
+_replica_factories = []
+
+
+def configure(engine=None, replicas=None):
+    """Create (or replace) the async engines used by the public handlers"""
+    global _session_factory, _replica_factories
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    if engine is None:
+        engine = create_async_engine(config.SQLALCHEMY_ASYNC_DATABASE_URI, **config.SQLALCHEMY_ASYNC_ENGINE_OPTIONS)
+    if replicas is None:
+        replicas = [create_async_engine(uri, **config.SQLALCHEMY_ASYNC_ENGINE_OPTIONS)
+                    for uri in config.SQLALCHEMY_ASYNC_REPLICA_URIS]
+    _session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    _replica_factories = [async_sessionmaker(replica, expire_on_commit=False) for replica in replicas]
+    return engine
+
+
+async def run_sync(build):
+    """Run a synchronous builder ``build(session)`` on an AsyncSession (on a replica when allowed)"""
+    factory = _session_factory
+    if _replica_factories and use_replica():
+        factory = random.choice(_replica_factories)
+    async with factory() as session:
+        return await session.run_sync(build)
+
+
+# One lock per cache key so that concurrent misses build the body only once; asyncio locks
+# because the builders suspend on the event loop thread, where a threading.Lock would deadlock
+_build_locks = weakref.WeakValueDictionary()
+
+
+async def get_cached_body(key, build, mimetype='text/html'):
+    """Async counterpart of cache.get_cached_body() for builders taking a session"""
+    cached = peek_cached_body(key)
+    if cached is not None:
+        return cached
+
+    lock = _build_locks.get(key)
+    if lock is None:
+        lock = _build_locks[key] = asyncio.Lock()
+    stale = peek_stale_body(key) if config.CACHE_STALE_WHILE_REVALIDATE else None
+    if stale is not None and lock.locked():
+        return stale  # Being rebuilt by another request
+    async with lock:
+        cached = peek_cached_body(key)
+        if cached is not None:
+            return cached
+        version = content_version()
+        if cache.backend.shared:
+            # Built by another worker (no cross-worker lock here: waiting on it would block the loop)
+            cached = await asyncio.to_thread(load_shared_body, key, version)
+            if cached is not None:
+                return cached
+        try:
+            result = await run_sync(build)
+        except Exception:
+            if stale is None:
+                raise
+            logger.exception("Rebuilding %s failed, serving the previous version", key)
+            return stale
+        # Compression (and the shared store) off the event loop
+        return await asyncio.to_thread(store_cached_body, key, result, mimetype, version)
+
+
+# ============================================================================
+# PUBLIC HANDLERS
+# ============================================================================
+
+class Delegate(Exception):
+    """Raised by a handler to let the Flask app answer the request"""
+
+
+def _render_home(session):
+    snapshot = peek_snapshot() or set_snapshot(load_snapshot(session=session, version=content_version()))
+    return render_home(snapshot)
+
+
+async def home():
+    return cached_response(await get_cached_body(home_cache_key(), _render_home))
+
+
+async def json_response(key, build):
+    cached = await get_cached_body(f"api:{key}", build, mimetype='application/json')
+    if cached is None:
+        raise Delegate()  # 404 message rendered by the Flask view
+    return cached_response(cached, cache_control=api.public_cache_control())
+
+
+async def profile():
+    return await json_response('profile', api.build_profile_json)
+
+
+async def skills():
+    try:
+        params = api.skills_params()
+    except ValueError:
+        raise Delegate()
+    return await json_response(api.list_cache_key('skills', params),
+                               lambda session: api.build_skills_json(params, session))
+
+
+async def projects():
+    try:
+        params = api.projects_params()
+    except ValueError:
+        raise Delegate()
+    if params['published'] != 'true':
+        raise Delegate()  # Needs the session cookie and Flask-Login
+    return await json_response(api.list_cache_key('projects', params),
+                               lambda session: api.build_projects_json(params, session))
+
+
+async def social_links():
+    return await json_response('social-links', api.build_social_links_json)
+
+
+async def sitemap():
+    return cached_response(await get_cached_body('sitemap.xml', seo.build_sitemap, mimetype='application/xml'))
+
+
+async def robots():
+    return cached_response(await get_cached_body('robots.txt', lambda session: seo.build_robots(),
+                                                 mimetype='text/plain'))
+
+
+HANDLERS = {
+    '/': home,
+    '/api/profile': profile,
+    '/api/skills': skills,
+    '/api/projects': projects,
+    '/api/social-links': social_links,
+    '/sitemap.xml': sitemap,
+    '/robots.txt': robots,
+}
+
+
+# ============================================================================
+# ASGI APPLICATION
+# ============================================================================
+
+def build_environ(scope):
+    """Minimal WSGI environ of a bodiless request, for Flask's request context"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': unquote(scope['path']),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+async def send_response(response, send, head=False):
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+               for name, value in response.headers.items()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    body = b'' if head else response.get_data()
+    await send({'type': 'http.response.body', 'body': body, 'more_body': False})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for factory in ([_session_factory] if _session_factory else []) + _replica_factories:
+                await factory.kw['bind'].dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application: async public handlers in front of the Flask app"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    handler = HANDLERS.get(scope.get('path')) if config.ASGI_ASYNC_ROUTES else None
+    if scope['type'] != 'http' or handler is None or scope['method'] not in ('GET', 'HEAD'):
+        return await wsgi(scope, receive, send)
+
+    if _session_factory is None:
+        configure()
+    with flask_app.request_context(build_environ(scope)):
+        try:
+            # The app and blueprint before_request hooks (timing, replica selection, ...)
+            # run as for a WSGI request; a hook returning a response answers the request
+            response = flask_app.preprocess_request()
+            if response is None:
+                response = await handler()
+        except Delegate:
+            response = None
+        except HTTPException as e:
+            response = e.get_response()
+        if response is not None:
+            response = flask_app.process_response(flask_app.make_response(response))
+    if response is None:
+        return await wsgi(scope, receive, send)
+    await send_response(response, send, head=scope['method'] == 'HEAD')
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Content-hashed static assets
+Fingerprints every file under static/ at startup, adds the hash to the URLs built
+by url_for('static', ...) and serves fingerprinted URLs with far-future immutable
+caching, using gzip/brotli bodies precompressed once for text assets
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from flask import current_app, request, abort, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, no-cache'
+TEXT_EXTENSIONS = {'.css', '.js', '.svg', '.txt', '.xml', '.json', '.map', '.ico', '.html'}
+
+
+@dataclass(frozen=True)
+class Asset:
+    """A static file with its content hash and precompressed variants"""
+    mtime: float
+    size: int
+    digest: str
+    gzip_body: Optional[bytes] = None
+    br_body: Optional[bytes] = None
+
+    @classmethod
+    def load(cls, path, stat):
+        with open(path, 'rb') as f:
+            data = f.read()
+        gzip_body = br_body = None
+        if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS:
+            gzip_body = gzip.compress(data, compresslevel=9, mtime=0)
+            br_body = brotli.compress(data, quality=11) if brotli else None
+            # Keep a variant only when it actually saves bytes
+            gzip_body = gzip_body if len(gzip_body) < len(data) else None
+            br_body = br_body if br_body is not None and len(br_body) < len(data) else None
+        return cls(
+            mtime=stat.st_mtime,
+            size=stat.st_size,
+            digest=hashlib.sha256(data).hexdigest()[:12],
+            gzip_body=gzip_body,
+            br_body=br_body
+        )
+
+
+class AssetManifest:
+    """Static files by absolute path, refreshed when a file changes on disk"""
+
+    def __init__(self):
+        self._assets: Dict[str, Asset] = {}
+        self._lock = threading.Lock()
+
+    def build(self, root):
+        """Fingerprint every file under ``root`` (run once at startup)"""
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                if not filename.endswith(('.gz', '.br')):
+                    self.get(root, os.path.relpath(os.path.join(directory, filename), root))
+
+    def get(self, root, filename) -> Optional[Asset]:
+        path = safe_join(root, filename)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        asset = self._assets.get(path)
+        if asset is None or asset.mtime != stat.st_mtime or asset.size != stat.st_size:
+            asset = Asset.load(path, stat)
+            with self._lock:
+                self._assets[path] = asset
+        return asset
+
+    def items(self, root):
+        """(relative filename, Asset) pairs of every known file under ``root``"""
+        prefix = os.path.join(root, '')
+        return [(os.path.relpath(path, root), asset)
+                for path, asset in list(self._assets.items()) if path.startswith(prefix)]
+
+
+manifest = AssetManifest()
+
+
+def add_asset_version(endpoint, values):
+    """url_defaults hook: append ?v=<content hash> to static URLs"""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        asset = manifest.get(current_app.static_folder, values['filename'])
+        if asset is not None:
+            values['v'] = asset.digest
+
+
+def send_asset(filename):
+    """Static file view serving precompressed bodies and immutable caching for hashed URLs"""
+    root = current_app.static_folder
+    asset = manifest.get(root, filename)
+    if asset is None:
+        abort(404)
+    cache_control = IMMUTABLE if request.args.get('v') == asset.digest else REVALIDATE
+
+    accept = request.accept_encodings
+    if asset.br_body is not None and accept['br']:
+        encoding, body = 'br', asset.br_body
+    elif asset.gzip_body is not None and accept['gzip']:
+        encoding, body = 'gzip', asset.gzip_body
+    else:
+        encoding, body = None, None
+
+    if body is None:
+        response = send_from_directory(root, filename, etag=asset.digest, conditional=True)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{asset.digest}-{encoding}")
+        response.last_modified = asset.mtime
+        response.make_conditional(request)
+
+    if asset.gzip_body is not None or asset.br_body is not None:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def init_app(app):
+    """Fingerprint the static folder and take over the static endpoint"""
+    manifest.build(app.static_folder)
+    app.url_defaults(add_asset_version)
+    app.view_functions['static'] = send_asset
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Load-testing benchmark
+Seeds a database with the init_db.py data scaled up to N projects, tags and skills,
+boots the application (in-process, or as a hypercorn/gunicorn server with the
+production profile) and measures throughput and p50/p95/p99 latency of the home
+page, every public /api GET, login and admin writes. Results are written as JSON;
+--baseline compares them with a previous run and fails on regressions.
+
+Usage: python benchmark.py [--projects 200] [--server hypercorn] [--output benchmark.json]
+       [--baseline previous.json]
+
+The default database is a temporary SQLite file; --mariadb uses the database
+configured in .env, which init_db.py drops and recreates.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ADMIN_USERNAME = 'admin'
+ADMIN_PASSWORD = 'admin123'
+
+
+# ============================================================================
+# SEEDING
+# ============================================================================
+
+def seed(app, projects=0, tags_per_project=0, skills=0):
+    """Add ``projects`` published projects (with ``tags_per_project`` tags each) and
+    ``skills`` skills on top of the data already in the database"""
+    from cache import bump_content_version
+    from models import db, Project, ProjectTag, Skill
+
+    with app.app_context():
+        tag_styles = [(tag.name, tag.color_class) for tag in ProjectTag.query.order_by(ProjectTag.id)]
+        icons = [(skill.icon_class, skill.category) for skill in Skill.query.order_by(Skill.id)]
+        first_order = 100
+
+        for i in range(projects):
+            project = Project(title=f"Progetto {i}", description=f"Progetto generato per il benchmark numero {i}",
+                              image_url='img/bash.webp', github_url=f"https://github.com/example/project-{i}",
+                              display_order=first_order + i, animation_delay='0s')
+            project.tags = [ProjectTag(name=tag_styles[(i + n) % len(tag_styles)][0],
+                                       color_class=tag_styles[(i + n) % len(tag_styles)][1], display_order=n)
+                            for n in range(tags_per_project)]
+            db.session.add(project)
+        for i in range(skills):
+            icon_class, category = icons[i % len(icons)]
+            db.session.add(Skill(name=f"Skill {i}", icon_class=icon_class, category=category,
+                                 display_order=first_order + i))
+        db.session.commit()
+    bump_content_version()
+
+
+# ============================================================================
+# TARGETS (in-process application or a real server)
+# ============================================================================
+
+class InProcessTarget:
+    """The Flask app driven through its test client, one client per thread"""
+
+    name = 'inprocess'
+
+    def __init__(self, app):
+        self.app = app
+
+    def client(self):
+        return self.app.test_client()
+
+    def anonymous(self, client):
+        return self.app.test_client()
+
+
+class ServerTarget:
+    """A hypercorn or gunicorn server started on a free local port"""
+
+    def __init__(self, server):
+        self.name = server
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, APP_HOST='127.0.0.1', APP_PORT=str(self.port))
+        env.setdefault('CACHE_BACKEND', 'file')  # One worker per CPU needs a shared content version
+        if server == 'hypercorn':
+            command = [sys.executable, '-m', 'hypercorn', '-c', 'python:server_config.hypercorn', 'asgi:app']
+        else:
+            command = [sys.executable, '-m', 'gunicorn', 'app:app']
+        self.process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+        self._wait_ready()
+
+    def _wait_ready(self, timeout=60):
+        import httpx
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with status {self.process.returncode}")
+            try:
+                httpx.get(f"{self.base_url}/robots.txt", timeout=1)
+                return
+            except httpx.TransportError:
+                time.sleep(0.2)
+        self.close()
+        raise RuntimeError(f"{self.name} did not start within {timeout}s")
+
+    def client(self):
+        import httpx
+        return httpx.Client(base_url=self.base_url, timeout=30)
+
+    def anonymous(self, client):
+        client.cookies.clear()
+        return client
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    request: Callable  # (target, client, i) -> response
+    expected: Tuple[int, ...] = (200,)
+    authenticated: bool = False
+    requests: Optional[int] = None  # Overrides --requests (slow scenarios)
+    inprocess_only: bool = False
+
+
+def _get(path):
+    return lambda target, client, i: client.get(path)
+
+
+def _uncached_home(target, client, i):
+    from cache import bump_content_version
+    bump_content_version()
+    return client.get('/')
+
+
+def _login(target, client, i):
+    return target.anonymous(client).post('/auth/login', data={'username': ADMIN_USERNAME,
+                                                              'password': ADMIN_PASSWORD})
+
+
+def _update_skill(target, client, i):
+    return client.put(f"/api/skills/{i % 8 + 1}", json={'proficiency_level': i % 100})
+
+
+def _update_project(target, client, i):
+    return client.put(f"/api/projects/{i % 3 + 1}",
+                      json={'description': f"Descrizione aggiornata {i}",
+                            'tags': [{'name': 'Linux', 'color_class': 'bg-info'},
+                                     {'name': f"Tag {i % 5}", 'color_class': 'bg-secondary'}]})
+
+
+SCENARIOS = [
+    Scenario('home', _get('/')),
+    Scenario('home (uncached)', _uncached_home, inprocess_only=True),
+    Scenario('api profile', _get('/api/profile')),
+    Scenario('api skills', _get('/api/skills')),
+    Scenario('api projects', _get('/api/projects')),
+    Scenario('api projects (page, fields)', _get('/api/projects?limit=20&fields=id,title,tags')),
+    Scenario('api social-links', _get('/api/social-links')),
+    Scenario('sitemap.xml', _get('/sitemap.xml')),
+    Scenario('login', _login, expected=(302,), requests=50),
+    Scenario('admin update skill', _update_skill, authenticated=True, requests=200),
+    Scenario('admin update project', _update_project, authenticated=True, requests=200),
+]
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)  # noqa: E731
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+def login(client):
+    response = client.post('/auth/login', data={'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"Benchmark login failed (HTTP {response.status_code})")
+    return client
+
+
+def run_scenario(target, scenario, requests, concurrency, warmup=10):
+    """Send ``requests`` requests from ``concurrency`` threads and summarize their latency"""
+    clients = [target.client() for _ in range(concurrency)]
+    if scenario.authenticated:
+        clients = [login(client) for client in clients]
+    for i in range(warmup):
+        scenario.request(target, clients[0], i)
+
+    counter = itertools.count()
+
+    def worker(client):
+        latencies, statuses, errors = [], Counter(), 0
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            response = scenario.request(target, client, i)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            errors += response.status_code not in scenario.expected
+        return latencies, statuses, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, clients))
+    elapsed = time.perf_counter() - start
+
+    latencies = [value for result in results for value in result[0]]
+    statuses = sum((result[1] for result in results), Counter())
+    return summarize(latencies, statuses, sum(result[2] for result in results), elapsed)
+
+
+def run(target, requests=500, concurrency=8, scenarios=None):
+    """Run every scenario against ``target`` and return {name: summary}"""
+    results = {}
+    for scenario in scenarios or SCENARIOS:
+        if scenario.inprocess_only and not isinstance(target, InProcessTarget):
+            continue
+        count = min(requests, scenario.requests) if scenario.requests else requests
+        results[scenario.name] = run_scenario(target, scenario, count, concurrency)
+        summary = results[scenario.name]
+        print(f"  {scenario.name:<30} {summary['throughput_rps']:>9.1f} req/s  p50 {summary['p50_ms']:>8.2f} ms"
+              f"  p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  errors {summary['errors']}")
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Regressions of ``results`` against a previous run: p95 slower or throughput lower
+    than the baseline by more than ``tolerance``"""
+    regressions = []
+    for name, previous in baseline.get('results', {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if previous['throughput_rps'] and current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {previous['errors']} -> {current['errors']} errors")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the portfolio against a seeded database")
+    parser.add_argument('--projects', type=int, default=200, help="Projects added to the init_db.py data")
+    parser.add_argument('--tags', type=int, default=5, help="Tags per added project")
+    parser.add_argument('--skills', type=int, default=100, help="Skills added to the init_db.py data")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="Client threads")
+    parser.add_argument('--server', choices=('inprocess', 'hypercorn', 'gunicorn'), default='inprocess')
+    parser.add_argument('--mariadb', action='store_true', help="Use (and reset) the database configured in .env")
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', help="Previous results; exit with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    # Before the application reads its configuration
+    if not args.mariadb:
+        os.environ['DB_ENGINE'] = 'sqlite'
+        os.environ['DB_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='portfolio-bench-'), 'portfolio.db')
+    os.environ['STATIC_EXPORT_DIR'] = ''
+
+    from app import app
+    from config import config
+    from init_db import init_database
+
+    print(f"Seeding {config.DB_ENGINE}: init_db.py data + {args.projects} projects "
+          f"({args.tags} tags each) + {args.skills} skills...")
+    init_database(reset=True)
+    seed(app, args.projects, args.tags, args.skills)
+
+    target = InProcessTarget(app) if args.server == 'inprocess' else ServerTarget(args.server)
+    print(f"\nBenchmark ({target.name}, {args.concurrency} threads):")
+    try:
+        results = run(target, args.requests, args.concurrency)
+    finally:
+        if isinstance(target, ServerTarget):
+            target.close()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'server': target.name,
+            'database': config.DB_ENGINE,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'scale': {'projects': args.projects, 'tags_per_project': args.tags, 'skills': args.skills},
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('server', 'database', 'concurrency', 'scale'):
+            if baseline.get('meta', {}).get(key) != report['meta'][key]:
+                print(f"   Note: the baseline used a different {key} ({baseline.get('meta', {}).get(key)})")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"   ⚠️  {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
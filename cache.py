@@ -0,0 +1,729 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Content cache for the public portfolio
+Holds an immutable snapshot of Profile, Skills, Projects (with tags) and Social Links,
+plus the rendered, precompressed response bodies built from it. Everything is
+invalidated by a content version number that every admin/API write bumps; the
+version lives in the CACHE_BACKEND (see cache_backends.py), so with the file or
+redis backend a write in one worker invalidates all of them, and rendered bodies
+are shared between workers behind this process's own LRU.
+Logged-in users are cached separately with a short TTL
+"""
+
+import gzip
+import hashlib
+import logging
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from flask import request, make_response
+from config import config
+from sqlalchemy import event, case, func, select, true
+from sqlalchemy.orm import selectinload
+from models import db, User, Profile, Skill, Project, ProjectTag, SocialLink
+from instrumentation import timed
+from cache_backends import create_backend, CacheBackendError
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+backend = create_backend(config)
+_listeners = []
+_version_seen = (None, 0.0)  # Current content version and when this worker first saw it
+
+
+def set_backend(new_backend):
+    """Replace the cache backend, returning the previous one"""
+    global backend
+    previous, backend = backend, new_backend
+    clear_local()
+    return previous
+
+
+def content_version() -> int:
+    """Return the current content version"""
+    global _version_seen
+    version = backend.version()
+    if version != _version_seen[0]:
+        _version_seen = (version, time.monotonic())
+    return version
+
+
+def content_changed_at() -> datetime:
+    """When the current content version was created, the Last-Modified of the content listings
+
+    Unlike the updated_at columns it also moves when rows are deleted or unpublished.
+    """
+    return datetime.fromtimestamp(backend.changed_at(), timezone.utc)
+
+
+def content_version_age() -> float:
+    """Seconds since this worker first saw the current content version"""
+    content_version()
+    return time.monotonic() - _version_seen[1]
+
+
+def bump_content_version() -> int:
+    """Invalidate every cached view of the portfolio content, in every worker"""
+    try:
+        version = backend.bump()
+    except CacheBackendError:
+        # Not broadcast: at least this worker must not keep serving the old content
+        logger.exception("Content change not shared with the other workers")
+        clear_local()
+        version = content_version()
+    for listener in _listeners:
+        listener()
+    return version
+
+
+def on_content_change(listener: Callable[[], None]):
+    """Register a callable run after every content version bump made by this worker"""
+    _listeners.append(listener)
+
+
+def clear_local():
+    """Drop the snapshot, statistics and bodies cached by this worker"""
+    global _snapshot, _stats
+    _snapshot = None
+    _stats = None
+    _uploads.clear()
+    with _bodies_lock:
+        _bodies.clear()
+
+
+# ============================================================================
+# SNAPSHOT RECORDS
+# ============================================================================
+
+@dataclass(frozen=True)
+class ProfileData:
+    id: int
+    title: str
+    lead_text: str
+    description_1: Optional[str]
+    description_2: Optional[str]
+    years_experience: Optional[int]
+    cv_url: Optional[str]
+    profile_image: Optional[str]
+
+    @classmethod
+    def from_model(cls, profile):
+        return cls(
+            id=profile.id,
+            title=profile.title,
+            lead_text=profile.lead_text,
+            description_1=profile.description_1,
+            description_2=profile.description_2,
+            years_experience=profile.years_experience,
+            cv_url=profile.cv_url,
+            profile_image=profile.profile_image
+        )
+
+
+@dataclass(frozen=True)
+class SkillData:
+    id: int
+    name: str
+    icon_class: str
+    category: Optional[str]
+    proficiency_level: Optional[int]
+    display_order: int
+
+    @classmethod
+    def from_model(cls, skill):
+        return cls(
+            id=skill.id,
+            name=skill.name,
+            icon_class=skill.icon_class,
+            category=skill.category,
+            proficiency_level=skill.proficiency_level,
+            display_order=skill.display_order
+        )
+
+
+@dataclass(frozen=True)
+class TagData:
+    id: int
+    name: str
+    color_class: str
+    display_order: int
+
+    @classmethod
+    def from_model(cls, tag):
+        return cls(
+            id=tag.id,
+            name=tag.name,
+            color_class=tag.color_class,
+            display_order=tag.display_order
+        )
+
+
+@dataclass(frozen=True)
+class ProjectData:
+    id: int
+    title: str
+    description: str
+    image_url: Optional[str]
+    demo_url: Optional[str]
+    github_url: Optional[str]
+    display_order: int
+    animation_delay: str
+    tags: Tuple[TagData, ...]
+
+    @classmethod
+    def from_model(cls, project):
+        return cls(
+            id=project.id,
+            title=project.title,
+            description=project.description,
+            image_url=project.image_url,
+            demo_url=project.demo_url,
+            github_url=project.github_url,
+            display_order=project.display_order,
+            animation_delay=project.animation_delay,
+            tags=tuple(TagData.from_model(tag) for tag in project.tags)
+        )
+
+
+@dataclass(frozen=True)
+class SocialLinkData:
+    id: int
+    platform_name: str
+    url: str
+    icon_class: str
+    display_order: int
+    animation_delay: str
+
+    @classmethod
+    def from_model(cls, link):
+        return cls(
+            id=link.id,
+            platform_name=link.platform_name,
+            url=link.url,
+            icon_class=link.icon_class,
+            display_order=link.display_order,
+            animation_delay=link.animation_delay
+        )
+
+
+@dataclass(frozen=True)
+class ContentSnapshot:
+    """Everything the public home page needs, already filtered and sorted"""
+    version: int
+    profile: Optional[ProfileData]
+    skills: Tuple[SkillData, ...]
+    projects: Tuple[ProjectData, ...]
+    social_links: Tuple[SocialLinkData, ...]
+
+
+def load_snapshot(session=None, version=None) -> ContentSnapshot:
+    """Read the public content from the database into an immutable snapshot"""
+    session = session or db.session
+    if version is None:
+        version = content_version()
+
+    profile = session.query(Profile).first()
+    skills = session.query(Skill).filter_by(is_active=True).order_by(Skill.display_order).all()
+    projects = (session.query(Project).options(selectinload(Project.tags))
+                .filter_by(is_published=True).order_by(Project.display_order).all())
+    social_links = session.query(SocialLink).filter_by(is_active=True).order_by(SocialLink.display_order).all()
+
+    return ContentSnapshot(
+        version=version,
+        profile=ProfileData.from_model(profile) if profile else None,
+        skills=tuple(SkillData.from_model(skill) for skill in skills),
+        projects=tuple(ProjectData.from_model(project) for project in projects),
+        social_links=tuple(SocialLinkData.from_model(link) for link in social_links)
+    )
+
+
+_snapshot_lock = threading.Lock()
+_snapshot: Optional[ContentSnapshot] = None
+
+
+def peek_snapshot() -> Optional[ContentSnapshot]:
+    """The cached snapshot if it matches the current content version, without loading"""
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == content_version():
+        return snapshot
+    return None
+
+
+def set_snapshot(snapshot: ContentSnapshot) -> ContentSnapshot:
+    global _snapshot
+    _snapshot = snapshot
+    return snapshot
+
+
+def get_snapshot() -> ContentSnapshot:
+    """Return the cached snapshot, reloading it if the content version changed"""
+    snapshot = peek_snapshot()
+    if snapshot is not None:
+        return snapshot
+
+    with _snapshot_lock:
+        # Another thread may have reloaded it while we were waiting
+        snapshot = peek_snapshot()
+        if snapshot is not None:
+            return snapshot
+        return set_snapshot(load_snapshot(version=content_version()))
+
+
+# ============================================================================
+# ADMIN DASHBOARD STATISTICS
+# ============================================================================
+
+@dataclass(frozen=True)
+class DashboardStats:
+    """Content counters for the admin dashboard, computed in one aggregate query"""
+    version: int
+    projects: int
+    published_projects: int
+    skills: int
+    active_skills: int
+    social_links: int
+    active_social_links: int
+    tags: int
+    max_tags_per_project: int
+    projects_updated_at: Optional[datetime]
+    profile_updated_at: Optional[datetime]
+
+    @property
+    def avg_tags_per_project(self) -> float:
+        return self.tags / self.projects if self.projects else 0.0
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def load_dashboard_stats(session=None, version=None) -> DashboardStats:
+    """Aggregate every table with conditional counts in a single round-trip"""
+    session = session or db.session
+    if version is None:
+        version = content_version()
+
+    projects = select(
+        func.count(Project.id).label('projects'),
+        _count_where(Project.is_published.is_(True)).label('published_projects'),
+        func.max(Project.updated_at).label('projects_updated_at'),
+    ).subquery()
+    skills = select(
+        func.count(Skill.id).label('skills'),
+        _count_where(Skill.is_active.is_(True)).label('active_skills'),
+    ).subquery()
+    links = select(
+        func.count(SocialLink.id).label('social_links'),
+        _count_where(SocialLink.is_active.is_(True)).label('active_social_links'),
+    ).subquery()
+    per_project = select(func.count(ProjectTag.id).label('tags')).group_by(ProjectTag.project_id).subquery()
+    tags = select(
+        func.coalesce(func.sum(per_project.c.tags), 0).label('tags'),
+        func.coalesce(func.max(per_project.c.tags), 0).label('max_tags_per_project'),
+    ).subquery()
+    profile = select(func.max(Profile.updated_at).label('profile_updated_at')).subquery()
+
+    # One-row subqueries joined side by side
+    query = select(projects, skills, links, tags, profile).select_from(
+        projects.join(skills, true()).join(links, true()).join(tags, true()).join(profile, true()))
+    row = session.execute(query).one()._mapping
+
+    return DashboardStats(
+        version=version,
+        projects=row['projects'],
+        published_projects=int(row['published_projects']),
+        skills=row['skills'],
+        active_skills=int(row['active_skills']),
+        social_links=row['social_links'],
+        active_social_links=int(row['active_social_links']),
+        tags=int(row['tags']),
+        max_tags_per_project=int(row['max_tags_per_project']),
+        projects_updated_at=row['projects_updated_at'],
+        profile_updated_at=row['profile_updated_at']
+    )
+
+
+_stats_lock = threading.Lock()
+_stats: Optional[DashboardStats] = None
+
+
+def get_dashboard_stats() -> DashboardStats:
+    """Return the cached dashboard statistics, recomputing them when the content version changed"""
+    global _stats
+    stats = _stats
+    version = content_version()
+    if stats is not None and stats.version == version:
+        return stats
+
+    with _stats_lock:
+        if _stats is not None and _stats.version == version:
+            return _stats
+        _stats = load_dashboard_stats(version=version)
+        return _stats
+
+
+@dataclass(frozen=True)
+class UploadUsage:
+    """Number and total size of the files under the upload folder"""
+    files: int
+    bytes: int
+    measured_at: float
+
+
+def measure_upload_usage(folder) -> UploadUsage:
+    files = size = 0
+    for directory, _, filenames in os.walk(folder):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(directory, filename))
+                files += 1
+            except OSError:
+                pass
+    return UploadUsage(files, size, time.monotonic())
+
+
+_uploads_lock = threading.Lock()
+_uploads: Dict[str, UploadUsage] = {}
+
+
+def get_upload_usage(folder) -> UploadUsage:
+    """Upload folder usage, measured again after UPLOAD_USAGE_TTL seconds
+
+    Not tied to the content version: image variants are written by a background
+    thread after the edit that bumped it.
+    """
+    usage = _uploads.get(folder)
+    if usage is not None and time.monotonic() - usage.measured_at < config.UPLOAD_USAGE_TTL:
+        return usage
+    with _uploads_lock:
+        usage = _uploads.get(folder)
+        if usage is None or time.monotonic() - usage.measured_at >= config.UPLOAD_USAGE_TTL:
+            usage = _uploads[folder] = measure_upload_usage(folder)
+        return usage
+
+
+# ============================================================================
+# RENDERED RESPONSE BODIES
+# ============================================================================
+
+@dataclass(frozen=True)
+class Payload:
+    """A body produced by a cache builder, with optional response metadata"""
+    body: bytes
+    last_modified: Optional[datetime] = None
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """A fully rendered response body with its precompressed variants"""
+    version: int
+    body: bytes
+    gzip_body: bytes
+    br_body: Optional[bytes]
+    etag: str
+    mimetype: str
+    last_modified: Optional[datetime] = None
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+    @classmethod
+    def build(cls, payload: Payload, mimetype: str, version: int):
+        body = payload.body
+        last_modified = payload.last_modified
+        if last_modified is not None:
+            # Naive datetimes in the models are UTC; HTTP dates have second precision
+            last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        with timed('compress'):
+            gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+            br_body = brotli.compress(body, quality=11) if brotli else None
+        return cls(
+            version=version,
+            body=body,
+            gzip_body=gzip_body,
+            br_body=br_body,
+            etag=hashlib.sha256(body).hexdigest()[:32],
+            mimetype=mimetype,
+            last_modified=last_modified,
+            headers=payload.headers
+        )
+
+    def etags(self):
+        """Strong ETags of every representation (identity, gzip, brotli)"""
+        return (self.etag, f"{self.etag}-gz", f"{self.etag}-br")
+
+    # Shared stores hold a length-prefixed JSON header followed by the raw bodies: reading
+    # an entry never runs code, whoever managed to write it
+    HEADER_SIZE = struct.Struct('<I')
+
+    def to_bytes(self) -> bytes:
+        bodies = (self.body, self.gzip_body, self.br_body or b'')
+        header = json.dumps({
+            'version': self.version,
+            'etag': self.etag,
+            'mimetype': self.mimetype,
+            'last_modified': self.last_modified.timestamp() if self.last_modified else None,
+            'headers': self.headers,
+            'sizes': [len(self.body), len(self.gzip_body), None if self.br_body is None else len(self.br_body)],
+        }).encode()
+        return b''.join((self.HEADER_SIZE.pack(len(header)), header, *bodies))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CachedBody':
+        """Inverse of to_bytes(), ValueError when ``data`` is not a well-formed entry"""
+        try:
+            (size,) = cls.HEADER_SIZE.unpack_from(data)
+            start = cls.HEADER_SIZE.size + size
+            header = json.loads(data[cls.HEADER_SIZE.size:start])
+            body_size, gzip_size, br_size = header['sizes']
+            if not all(isinstance(n, int) and n >= 0 for n in (body_size, gzip_size, br_size or 0)):
+                raise ValueError("Invalid body sizes")
+            end = start + body_size + gzip_size + (br_size or 0)
+            if end != len(data):
+                raise ValueError("Truncated cache entry")
+            last_modified = header['last_modified']
+            return cls(
+                version=int(header['version']),
+                body=data[start:start + body_size],
+                gzip_body=data[start + body_size:start + body_size + gzip_size],
+                br_body=None if br_size is None else data[end - br_size:end],
+                etag=str(header['etag']),
+                mimetype=str(header['mimetype']),
+                last_modified=None if last_modified is None else datetime.fromtimestamp(last_modified, timezone.utc),
+                headers=tuple((str(name), str(value)) for name, value in header['headers'])
+            )
+        except (struct.error, KeyError, TypeError) as e:
+            raise ValueError(f"Malformed cache entry: {e}") from e
+
+
+# Query strings are part of the keys, so the cache is bounded (least recently used goes first)
+_bodies_lock = threading.Lock()
+_bodies: "OrderedDict[str, CachedBody]" = OrderedDict()
+_build_locks: Dict[str, threading.Lock] = {}
+
+
+def _store_body(key: str, cached: CachedBody):
+    with _bodies_lock:
+        _bodies[key] = cached
+        _bodies.move_to_end(key)
+        while len(_bodies) > config.CACHE_MAX_ENTRIES:
+            evicted, _ = _bodies.popitem(last=False)
+            _build_locks.pop(evicted, None)
+
+
+def peek_cached_body(key: str) -> Optional[CachedBody]:
+    """The cached body for ``key`` if it is up to date, without building it"""
+    cached = _bodies.get(key)
+    if cached is not None and cached.version == content_version():
+        with _bodies_lock:
+            if key in _bodies:
+                _bodies.move_to_end(key)
+        return cached
+    return None
+
+
+def load_shared_body(key: str, version: int) -> Optional[CachedBody]:
+    """The body another worker built for content ``version``, kept in this worker's LRU"""
+    if not backend.shared:
+        return None
+    data = backend.get(key)
+    if data is None:
+        return None
+    try:
+        cached = CachedBody.from_bytes(data)
+    except ValueError:
+        logger.warning("Discarding an unreadable shared cache entry for %s", key)
+        return None
+    if cached.version != version:
+        return None
+    _store_body(key, cached)
+    return cached
+
+
+def store_cached_body(key: str, result: Union[bytes, Payload, None], mimetype: str,
+                      version: int) -> Optional[CachedBody]:
+    """Compress and cache a builder result produced for content ``version``"""
+    if result is None:
+        return None
+    payload = result if isinstance(result, Payload) else Payload(result)
+    cached = CachedBody.build(payload, mimetype, version)
+    _store_body(key, cached)
+    if backend.shared:
+        backend.set(key, cached.to_bytes())
+    return cached
+
+
+def peek_stale_body(key: str) -> Optional[CachedBody]:
+    """The last body built for ``key``, whatever its content version"""
+    return _bodies.get(key)
+
+
+def get_cached_body(key: str, build: Callable[[], Union[bytes, Payload, None]],
+                    mimetype: str = 'text/html') -> Optional[CachedBody]:
+    """Return the cached body for ``key``, building it once per content version
+
+    ``build`` returns the body bytes, a Payload, or None when there is
+    nothing to serve (None is not cached). Concurrent misses wait for a single
+    build; with CACHE_STALE_WHILE_REVALIDATE, requests that find an outdated body
+    while it is being rebuilt get that body instead of waiting, and so does the
+    rebuilding request when the build fails.
+    """
+    cached = peek_cached_body(key)
+    if cached is not None:
+        return cached
+
+    with _bodies_lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    stale = peek_stale_body(key) if config.CACHE_STALE_WHILE_REVALIDATE else None
+    if not build_lock.acquire(blocking=stale is None):
+        return stale
+    try:
+        cached = peek_cached_body(key)
+        if cached is not None:
+            return cached
+        version = content_version()
+        cached = load_shared_body(key, version)
+        if cached is not None:
+            return cached
+
+        # One worker builds, the others wait for its result instead of querying the database too
+        with backend.build_lock(key, config.CACHE_LOCK_TIMEOUT):
+            cached = load_shared_body(key, version)
+            if cached is not None:
+                return cached
+            try:
+                result = build()
+            except Exception:
+                if stale is None:
+                    raise
+                logger.exception("Rebuilding %s failed, serving the previous version", key)
+                return stale
+            return store_cached_body(key, result, mimetype, version)
+    finally:
+        build_lock.release()
+
+
+def cached_response(cached: CachedBody, cache_control: str = 'public, no-cache'):
+    """Build a response from a cached body, answering 304 when the client is up to date"""
+    matched = next((tag for tag in cached.etags() if request.if_none_match.contains(tag)), None)
+    if not request.if_none_match and cached.last_modified and request.if_modified_since:
+        # If-Modified-Since is only honoured when the client sent no ETag
+        not_modified = request.if_modified_since >= cached.last_modified
+    else:
+        not_modified = matched is not None
+
+    if not_modified:
+        response = make_response('', 304)
+        response.set_etag(matched or cached.etag)
+    else:
+        accept = request.accept_encodings
+        if cached.br_body is not None and accept['br']:
+            response = make_response(cached.br_body)
+            response.headers['Content-Encoding'] = 'br'
+            response.set_etag(f"{cached.etag}-br")
+        elif accept['gzip']:
+            response = make_response(cached.gzip_body)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.set_etag(f"{cached.etag}-gz")
+        else:
+            response = make_response(cached.body)
+            response.set_etag(cached.etag)
+        response.mimetype = cached.mimetype
+
+    if cached.last_modified:
+        response.last_modified = cached.last_modified
+    for name, value in cached.headers:
+        response.headers[name] = value
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+# ============================================================================
+# LOGGED-IN USERS
+# ============================================================================
+
+@dataclass(frozen=True)
+class UserData:
+    """Read-only copy of a User used as Flask-Login's current_user"""
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    last_login: Optional[datetime]
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def get_id(self):
+        return str(self.id)
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=bool(user.is_active),
+            last_login=user.last_login
+        )
+
+
+_users_lock = threading.Lock()
+_users: Dict[int, Tuple[float, Optional[UserData]]] = {}
+_users_generation = 0
+
+
+def get_user(user_id: int) -> Optional[UserData]:
+    """Active user for Flask-Login, read from the database at most every USER_CACHE_TTL seconds
+
+    Disabled and deleted accounts resolve to None, which logs the session out.
+    """
+    now = time.monotonic()
+    entry = _users.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    generation = _users_generation
+    user = db.session.get(User, user_id)
+    data = UserData.from_model(user) if user is not None and user.is_active else None
+    if config.USER_CACHE_TTL:
+        with _users_lock:
+            # Don't store a row read before a concurrent invalidation
+            if generation == _users_generation:
+                _users[user_id] = (now + config.USER_CACHE_TTL, data)
+    return data
+
+
+def invalidate_user(user_id: Optional[int] = None):
+    """Drop one cached user (or all of them)"""
+    global _users_generation
+    with _users_lock:
+        _users_generation += 1
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(user_id, None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_changed_user(mapper, connection, target):
+    """Password changes, activation flags and login updates evict the user at once"""
+    invalidate_user(target.id)
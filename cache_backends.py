@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Cache backends shared by the worker processes
+A backend owns the content version and, when it is shared, a second-level store of
+rendered response bodies and a lock per key so that only one worker rebuilds a body
+after an invalidation:
+
+- local: version and bodies in this process only (a single worker)
+- file: version in a memory-mapped file and bodies in a directory, for the workers of one host
+- redis: version, bodies and locks in a Redis-compatible server; version changes are
+  broadcast with pub/sub so that reading the version never leaves the process
+
+Stored values are plain bytes (cache.CachedBody.to_bytes()), never unpickled. The file
+backend still refuses a directory that another user owns or can read or write.
+"""
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import stat
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class CacheBackendError(Exception):
+    """Raised when the shared backend cannot record a content change or cannot be used safely"""
+
+
+def next_change_time(previous: int) -> int:
+    """Timestamp of a new content version: now, in whole seconds, but always after ``previous``
+
+    It is the Last-Modified of the content listings, so two changes within one
+    second must still give two different (second-precision) HTTP dates.
+    """
+    return max(int(time.time()), previous + 1)
+
+
+def release_id() -> str:
+    """Fingerprint of the code, templates and static files of this deployment
+
+    Shared bodies are namespaced with it, so a deploy never serves pages
+    rendered by the previous release.
+    """
+    digest = hashlib.sha1()
+    for root in ('', 'routes', 'templates', 'static'):
+        top = os.path.join(BASE_DIR, root)
+        for directory, dirnames, filenames in os.walk(top):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith(('.', '__')) and d not in ('img', 'vendor'))
+            if not root:
+                dirnames[:] = []  # Only the top-level modules
+            for filename in sorted(filenames):
+                if root or filename.endswith('.py'):
+                    path = os.path.join(directory, filename)
+                    digest.update(os.path.relpath(path, BASE_DIR).encode())
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class LocalBackend:
+    """Content version of this process only"""
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._changed_at = int(time.time())  # The content may have changed before this process started
+
+    def version(self) -> int:
+        return self._version
+
+    def changed_at(self) -> int:
+        """Unix time at which the current version was created"""
+        return self._changed_at
+
+    def bump(self) -> int:
+        with self._lock:
+            self._changed_at = next_change_time(self._changed_at)
+            self._version += 1
+            return self._version
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes):
+        pass
+
+    @contextmanager
+    def build_lock(self, key: str, timeout: float) -> Iterator[bool]:
+        yield True
+
+    def close(self):
+        pass
+
+
+def check_private_directory(path: str):
+    """Refuse a cache directory that is not ours alone (owned by this user, mode 0700)
+
+    Anyone able to write in it could plant the responses served to every visitor.
+    """
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise CacheBackendError(f"Cache path {path} is not a directory")
+    if info.st_uid != os.geteuid():
+        raise CacheBackendError(f"Cache directory {path} is not owned by the application user")
+    if info.st_mode & 0o077:
+        raise CacheBackendError(f"Cache directory {path} must be private: chmod 700 {path}")
+
+
+class FileBackend:
+    """Version counter in a shared memory-mapped file, bodies in a directory
+
+    Every worker maps the same file, so a bump is visible to all of them on their
+    next read. The file holds the version and the time it was created; bumps are
+    serialized with flock() and build locks are striped lock files.
+    """
+
+    shared = True
+    LOCK_STRIPES = 64
+    LAYOUT = struct.Struct('<Qq')  # version, unix time of the change
+
+    def __init__(self, path: str, namespace: str):
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        check_private_directory(path)
+        self.path = path
+        self.bodies = os.path.join(path, 'bodies', namespace)
+        self.locks = os.path.join(path, 'locks')
+        os.makedirs(self.bodies, exist_ok=True)
+        os.makedirs(self.locks, exist_ok=True)
+
+        self._version_fd = os.open(os.path.join(path, 'version'), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._version_fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._version_fd).st_size < self.LAYOUT.size:
+                os.ftruncate(self._version_fd, self.LAYOUT.size)
+            self._map = mmap.mmap(self._version_fd, self.LAYOUT.size)
+            version, changed_at = self.LAYOUT.unpack_from(self._map)
+            if not changed_at:  # New file, or written by a release that did not record it
+                self.LAYOUT.pack_into(self._map, 0, version, int(time.time()))
+        finally:
+            fcntl.flock(self._version_fd, fcntl.LOCK_UN)
+        self._prune_releases(namespace)
+
+    def _prune_releases(self, namespace):
+        """Remove the bodies of previous deployments"""
+        root = os.path.dirname(self.bodies)
+        for name in os.listdir(root):
+            if name != namespace:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def version(self) -> int:
+        return self.LAYOUT.unpack_from(self._map)[0]
+
+    def changed_at(self) -> int:
+        return self.LAYOUT.unpack_from(self._map)[1]
+
+    def bump(self) -> int:
+        fcntl.flock(self._version_fd, fcntl.LOCK_EX)
+        try:
+            version, changed_at = self.LAYOUT.unpack_from(self._map)
+            version += 1
+            self.LAYOUT.pack_into(self._map, 0, version, next_change_time(changed_at))
+        finally:
+            fcntl.flock(self._version_fd, fcntl.LOCK_UN)
+        # Every stored body belongs to an older version now
+        try:
+            filenames = os.listdir(self.bodies)
+        except OSError:
+            filenames = []
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(self.bodies, filename))
+            except OSError:
+                pass
+        return version
+
+    def _body_path(self, key):
+        return os.path.join(self.bodies, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key: str, value: bytes):
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.bodies, prefix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp, self._body_path(key))
+        except OSError:
+            # e.g. the directory of this release was pruned by a newer deployment
+            logger.warning("Could not store a shared cache entry", exc_info=True)
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+    @contextmanager
+    def build_lock(self, key: str, timeout: float) -> Iterator[bool]:
+        stripe = int(hashlib.sha1(key.encode()).hexdigest(), 16) % self.LOCK_STRIPES
+        with open(os.path.join(self.locks, f"{stripe:02d}.lock"), 'wb') as lock_file:
+            deadline = time.monotonic() + timeout
+            acquired = False
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.01)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        self._map.close()
+        os.close(self._version_fd)
+
+
+class RedisBackend:
+    """Version, bodies and build locks in Redis, version changes broadcast with pub/sub
+
+    The broadcast message is "<version>:<unix time of the change>".
+    """
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str, namespace: str, ttl: int, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.namespace = namespace
+        self.ttl = ttl or None
+        self.version_key = f"{prefix}version"
+        self.time_key = f"{prefix}version_time"
+        self.channel = f"{prefix}invalidate"
+        self._state = (0, int(time.time()))  # version, changed_at
+        self._synced = 0.0
+        self._listener = None
+        self._listener_pid = None
+        self._stopped = threading.Event()
+        self._resync()
+
+    def _apply(self, version, changed_at):
+        if version >= self._state[0]:
+            self._state = (version, changed_at)
+
+    def _resync(self):
+        try:
+            version, changed_at = self.client.mget(self.version_key, self.time_key)
+            if changed_at is None:
+                self.client.setnx(self.time_key, self._state[1])
+                changed_at = self.client.get(self.time_key)
+            self._apply(int(version or 0), int(changed_at))
+            self._synced = time.monotonic()
+        except Exception:
+            logger.exception("Could not read the content version from Redis")
+
+    def _listen(self):
+        """Follow the version broadcast, resynchronizing after every reconnection"""
+        while not self._stopped.is_set():
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._resync()  # Bumps missed while disconnected
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        data = message['data']
+                        version, _, changed_at = (data.decode() if isinstance(data, bytes) else str(data)).partition(':')
+                        self._apply(int(version), int(changed_at or self._state[1]))
+                    self._synced = time.monotonic()
+                pubsub.close()
+            except Exception:
+                logger.warning("Redis invalidation channel lost, reconnecting", exc_info=True)
+                self._stopped.wait(1.0)
+
+    def _ensure_listener(self):
+        # Started lazily and again after a fork, since threads do not survive it
+        if self._listener_pid != os.getpid():
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+            self._listener.start()
+
+    def version(self) -> int:
+        self._ensure_listener()
+        if time.monotonic() - self._synced > 5:
+            self._resync()  # The listener is not keeping up (Redis unreachable)
+        return self._state[0]
+
+    def changed_at(self) -> int:
+        self.version()
+        return self._state[1]
+
+    def bump(self) -> int:
+        changed_at = None
+
+        def increment(pipe):
+            nonlocal changed_at
+            changed_at = next_change_time(int(pipe.get(self.time_key) or 0))
+            pipe.multi()
+            pipe.incr(self.version_key)
+            pipe.set(self.time_key, changed_at)
+
+        try:
+            version = int(self.client.transaction(increment, self.time_key)[0])
+            self.client.publish(self.channel, f"{version}:{changed_at}")
+        except Exception as e:
+            raise CacheBackendError(f"Could not broadcast the content change: {e}") from e
+        self._apply(version, changed_at)
+        return version
+
+    def _body_key(self, key):
+        return f"{self.prefix}body:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self._body_key(key))
+        except Exception:
+            logger.warning("Redis unavailable, cache entry not read", exc_info=True)
+            return None
+
+    def set(self, key: str, value: bytes):
+        try:
+            self.client.set(self._body_key(key), value, ex=self.ttl)
+        except Exception:
+            logger.warning("Redis unavailable, cache entry not stored", exc_info=True)
+
+    @contextmanager
+    def build_lock(self, key: str, timeout: float) -> Iterator[bool]:
+        lock = self.client.lock(f"{self.prefix}lock:{key}", timeout=max(timeout * 3, 30), blocking_timeout=timeout)
+        try:
+            acquired = lock.acquire()
+        except Exception:
+            logger.warning("Redis unavailable, building without the shared lock", exc_info=True)
+            acquired = False
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception:
+                    pass  # Expired or Redis gone: the lock times out by itself
+
+    def close(self):
+        self._stopped.set()
+
+
+def create_backend(cfg):
+    """Backend selected by CACHE_BACKEND"""
+    if cfg.CACHE_BACKEND == 'file':
+        # Not a fixed name in the shared temporary directory, where another user could create it first
+        path = cfg.CACHE_FILE_PATH or os.path.join(BASE_DIR, 'cache')
+        return FileBackend(path, release_id())
+    if cfg.CACHE_BACKEND == 'redis':
+        return RedisBackend(cfg.CACHE_REDIS_URL, cfg.CACHE_KEY_PREFIX, release_id(), cfg.CACHE_SHARED_TTL)
+    return LocalBackend()
@@ -3,13 +3,51 @@
 
 # Copyright Hersel Giannella
 
+from typing import List, Literal, Optional
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 class Config(BaseSettings):
     APP_HOST: str = "127.0.0.1"
     APP_PORT: int = 5000
-    DEBUG: bool = True
+    DEBUG: bool = False
     SECRET_KEY: str = "default_secret_key"
+    # Public address of the site, used for the absolute URLs of sitemap.xml and robots.txt
+    SITE_URL: str = "https://hersel.it"
+
+    # Application server (server_config.py): "production" refuses DEBUG and SERVER_RELOAD
+    SERVER_PROFILE: Literal["production", "development"] = "production"
+    SERVER_WORKERS: int = Field(0, ge=0)  # 0 = from the CPU count
+    SERVER_THREADS: int = Field(0, ge=0)  # gunicorn threads per worker, 0 = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    SERVER_KEEPALIVE: int = Field(5, ge=0)  # Seconds an idle keep-alive connection stays open
+    SERVER_BACKLOG: int = Field(2048, ge=1)  # Pending connections queued by the listen socket
+    SERVER_TIMEOUT: int = Field(30, ge=1)  # gunicorn: a worker silent for longer is restarted
+    SERVER_GRACEFUL_TIMEOUT: int = Field(30, ge=1)  # Seconds to finish in-flight requests on restart
+    # Workers are replaced after SERVER_MAX_REQUESTS requests (0 = never), plus a random
+    # 0..SERVER_MAX_REQUESTS_JITTER so they do not restart together (default 10%)
+    SERVER_MAX_REQUESTS: int = Field(10000, ge=0)
+    SERVER_MAX_REQUESTS_JITTER: Optional[int] = Field(None, ge=0)
+    SERVER_RELOAD: bool = False
+    SERVER_ACCESS_LOG: bool = False
+
+    # Password hashing cost (2^rounds bcrypt iterations); older hashes are upgraded at login
+    BCRYPT_LOG_ROUNDS: int = Field(12, ge=4, le=31)
+    # Login throttling: failed attempts allowed per client IP and per username in LOGIN_RATE_WINDOW seconds
+    LOGIN_MAX_FAILURES_PER_IP: int = Field(20, ge=1)
+    LOGIN_MAX_FAILURES_PER_USER: int = Field(5, ge=1)
+    LOGIN_RATE_WINDOW: int = Field(900, ge=1)
+    # Password checks run on LOGIN_HASH_WORKERS threads; with LOGIN_HASH_QUEUE checks in flight, or
+    # after waiting LOGIN_HASH_TIMEOUT seconds for the result, logins are answered 503
+    LOGIN_HASH_WORKERS: int = Field(2, ge=1)
+    LOGIN_HASH_QUEUE: int = Field(8, ge=1)
+    LOGIN_HASH_TIMEOUT: float = Field(5.0, gt=0)
+    # Seconds a logged-in user is served from the per-worker cache instead of the database
+    # (changes made in the same worker invalidate it at once, 0 disables the cache)
+    USER_CACHE_TTL: int = Field(30, ge=0)
+    # Seconds the upload folder size shown on the admin dashboard is reused before walking it again
+    UPLOAD_USAGE_TTL: int = Field(60, ge=0)
+    # Reverse proxies in front of the app whose X-Forwarded-For header is trusted (0 = none)
+    TRUSTED_PROXY_COUNT: int = Field(0, ge=0)
 
     # Database Configuration
     DB_HOST: str = "localhost"
@@ -18,13 +56,140 @@ class Config(BaseSettings):
     DB_PASSWORD: str = "portfolio_password"
     DB_NAME: str = "portfolio_db"
 
+    # "sqlite" is meant for tests and local benchmarks; an empty DB_SQLITE_PATH means in-memory
+    DB_ENGINE: Literal["mariadb", "sqlite"] = "mariadb"
+    DB_SQLITE_PATH: str = ""
+
+    # Connection Pool (per worker process: N workers open up to N * (size + overflow) connections)
+    DB_POOL_SIZE: int = Field(5, ge=1)
+    DB_MAX_OVERFLOW: int = Field(5, ge=0)
+    DB_POOL_TIMEOUT: int = Field(10, ge=1)  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = Field(1800, ge=-1)  # Keep below MariaDB wait_timeout, -1 disables
+    DB_POOL_PRE_PING: bool = True
+    DB_CONNECT_TIMEOUT: int = Field(5, ge=1)
+    DB_READ_TIMEOUT: int = Field(30, ge=1)
+    DB_WRITE_TIMEOUT: int = Field(30, ge=1)
+
+    # Read replicas for the public GET routes (db_routing.py), as "host" or "host:port" with the
+    # user, password and database of the primary; empty = every query goes to the primary.
+    # Each replica gets its own pool of DB_POOL_SIZE + DB_MAX_OVERFLOW connections per worker
+    DB_REPLICA_HOSTS: List[str] = []
+    # Seconds a browser that committed a change keeps reading from the primary (read-your-writes)
+    DB_REPLICA_STICKY_SECONDS: int = Field(10, ge=0)
+    # Seconds after a content change during which every read goes to the primary, so that the
+    # response cache is not rebuilt from a replica that has not caught up yet
+    DB_REPLICA_MAX_LAG: float = Field(5, ge=0)
+
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         """Construct MariaDB connection string"""
+        if self.DB_ENGINE == "sqlite":
+            return f"sqlite:///{self.DB_SQLITE_PATH}" if self.DB_SQLITE_PATH else "sqlite://"
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    def _replica_addresses(self) -> List[str]:
+        if self.DB_ENGINE == "sqlite":
+            return []
+        return [host if ':' in host else f"{host}:{self.DB_PORT}" for host in self.DB_REPLICA_HOSTS]
+
+    @property
+    def SQLALCHEMY_REPLICA_URIS(self) -> List[str]:
+        """Connection strings of the read replicas"""
+        return [f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{address}/{self.DB_NAME}"
+                for address in self._replica_addresses()]
+
+    @property
+    def SQLALCHEMY_ENGINE_OPTIONS(self) -> dict:
+        """Connection pool and driver timeout options passed to create_engine()"""
+        if self.DB_ENGINE == "sqlite":
+            options = {"connect_args": {"check_same_thread": False}}
+            if not self.DB_SQLITE_PATH:
+                # A single shared connection, otherwise every connection gets its own empty database
+                from sqlalchemy.pool import StaticPool
+                options["poolclass"] = StaticPool
+            return options
+
+        return {
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+            "connect_args": {
+                "connect_timeout": self.DB_CONNECT_TIMEOUT,
+                "read_timeout": self.DB_READ_TIMEOUT,
+                "write_timeout": self.DB_WRITE_TIMEOUT,
+            },
+        }
+
+    # asgi.py: serve home, the public GET /api endpoints, sitemap.xml and robots.txt from
+    # async handlers on an asyncio database driver (False = the whole app runs as WSGI)
+    ASGI_ASYNC_ROUTES: bool = False
+
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> str:
+        """Connection string of the async engine used by asgi.py"""
+        if self.DB_ENGINE == "sqlite":
+            return f"sqlite+aiosqlite:///{self.DB_SQLITE_PATH}" if self.DB_SQLITE_PATH else "sqlite+aiosqlite://"
+        return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
+    @property
+    def SQLALCHEMY_ASYNC_REPLICA_URIS(self) -> List[str]:
+        """Connection strings of the read replicas for the async engines of asgi.py"""
+        return [f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{address}/{self.DB_NAME}"
+                for address in self._replica_addresses()]
+
+    @property
+    def SQLALCHEMY_ASYNC_ENGINE_OPTIONS(self) -> dict:
+        """Pool options passed to create_async_engine()"""
+        if self.DB_ENGINE == "sqlite":
+            return {}
+        return {
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+            "connect_args": {"connect_timeout": self.DB_CONNECT_TIMEOUT},
+        }
+
+    # HTTP caching of the public /api GET endpoints (0 = clients always revalidate with the ETag)
+    API_CACHE_MAX_AGE: int = Field(0, ge=0)
+    # Maximum number of rendered responses kept per worker
+    CACHE_MAX_ENTRIES: int = Field(256, ge=1)
+    # Where the content version and the shared rendered responses live (cache_backends.py):
+    # "local" = this process only (one worker), "file" = memory-mapped file shared by the workers
+    # of one host, "redis" = a Redis-compatible server with pub/sub invalidation
+    CACHE_BACKEND: Literal["local", "file", "redis"] = "local"
+    CACHE_FILE_PATH: str = ""  # Empty = cache/ next to the code; must be owned by the app user, mode 0700
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_KEY_PREFIX: str = "portfolio:"
+    CACHE_SHARED_TTL: int = Field(86400, ge=0)  # Seconds a shared response is kept in Redis (0 = no expiry)
+    # Seconds a worker waits for another worker rebuilding the same response before building it too
+    CACHE_LOCK_TIMEOUT: float = Field(10, gt=0)
+    # While a response is rebuilt after a change, serve its previous version to the other requests
+    # (and keep serving it if the rebuild fails) instead of making them wait
+    CACHE_STALE_WHILE_REVALIDATE: bool = True
+
+    # Pagination of /api/projects and /api/skills
+    API_PAGE_SIZE: int = Field(50, ge=1)
+    API_MAX_PAGE_SIZE: int = Field(200, ge=1)
+    # Maximum number of operations accepted by POST /api/batch
+    API_BATCH_MAX_ITEMS: int = Field(500, ge=1)
+
+    # Uploaded images: widths of the generated WebP/AVIF variants and background encoder threads
+    IMAGE_VARIANT_WIDTHS: List[int] = [320, 640, 960, 1280]
+    IMAGE_QUALITY: int = Field(80, ge=1, le=100)
+    IMAGE_WORKERS: int = Field(2, ge=1)
+
+    # Directory where export_static.py writes the pre-rendered public site; when set, every
+    # content change re-exports it in the background (empty = disabled)
+    STATIC_EXPORT_DIR: str = ""
+
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = False
     SQLALCHEMY_ECHO: bool = False  # Set to True for SQL query debugging
+    # Server-Timing response header with the database, template, serialization and compression times
+    SERVER_TIMING: bool = True
 
     class Config:
         env_file = ".env"
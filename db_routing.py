@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Read replica routing
+With DB_REPLICA_HOSTS set, GET and HEAD requests of the public routes (home, the /api
+GET endpoints, sitemap.xml and robots.txt) read from one of the replicas, chosen per
+request, while admin, auth and every write use the primary. Replicas are Flask-SQLAlchemy
+binds ("replica1", "replica2", ...), so their pools show up in /admin/metrics.
+
+Replication is asynchronous, so two things keep a lagging replica from being noticed:
+a browser that committed a change reads from the primary for DB_REPLICA_STICKY_SECONDS
+(read-your-writes), and for DB_REPLICA_MAX_LAG seconds after a content change every
+read goes to the primary, so the response cache is never rebuilt from old rows.
+"""
+
+import random
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from config import config
+
+# Cookie that keeps a browser on the primary after a write; it only ever moves reads off
+# the replicas, so it needs no signature
+STICKY_COOKIE = 'read_primary'
+
+
+def replica_binds(cfg) -> dict:
+    """SQLALCHEMY_BINDS entries of the configured replicas"""
+    return {f"replica{n}": uri for n, uri in enumerate(cfg.SQLALCHEMY_REPLICA_URIS, start=1)}
+
+
+REPLICA_BINDS = tuple(replica_binds(config))
+
+
+class RoutingSession(Session):
+    """db.session reading from the replica picked for the current request, if any"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            replica = g.get('db_replica')
+            if replica is not None:
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_commit(session):
+    if has_request_context():
+        g.db_committed = True
+
+
+def use_replica() -> bool:
+    """Whether the current request may read from a replica"""
+    if not REPLICA_BINDS or request.method not in ('GET', 'HEAD') or request.cookies.get(STICKY_COOKIE):
+        return False
+    from cache import content_version_age  # cache imports the models, which import this module
+    return content_version_age() >= config.DB_REPLICA_MAX_LAG
+
+
+def prefer_replica():
+    """before_request hook of the public blueprints"""
+    if use_replica():
+        g.db_replica = random.choice(REPLICA_BINDS)
+
+
+def init_app(app):
+    """Keep browsers that committed a change on the primary for DB_REPLICA_STICKY_SECONDS"""
+    @app.after_request
+    def stick_to_primary(response):
+        if REPLICA_BINDS and config.DB_REPLICA_STICKY_SECONDS and g.get('db_committed'):
+            response.set_cookie(STICKY_COOKIE, '1', max_age=config.DB_REPLICA_STICKY_SECONDS,
+                                secure=request.is_secure, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Static export of the public portfolio
+Renders the home page, the public API responses, sitemap.xml and robots.txt to a
+directory of files with gzip/brotli siblings, next to a copy of the fingerprinted
+static assets, so that nginx can serve the public site without Python
+
+Usage: python export_static.py [OUTPUT_DIR]
+"""
+
+import gzip
+import logging
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from cache import on_content_change
+import assets
+import images
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# URL -> file written in the export directory
+PAGES = {
+    '/': 'index.html',
+    '/api/profile': 'api/profile.json',
+    '/api/skills': 'api/skills.json',
+    '/api/projects': 'api/projects.json',
+    '/api/social-links': 'api/social-links.json',
+    '/sitemap.xml': 'sitemap.xml',
+    '/robots.txt': 'robots.txt',
+    '/favicon.ico': 'favicon.ico',
+}
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def _write_variant(path, data, original_size):
+    """Write a precompressed sibling, or remove a stale one that no longer saves bytes"""
+    if data is not None and len(data) < original_size:
+        _write_atomic(path, data)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def write_page(path, body):
+    """Write a rendered body with its .gz and .br variants"""
+    _write_atomic(path, body)
+    _write_variant(path + '.gz', gzip.compress(body, compresslevel=9, mtime=0), len(body))
+    _write_variant(path + '.br', brotli.compress(body, quality=11) if brotli else None, len(body))
+
+
+def export_pages(app, output_dir):
+    """Render every public URL through the application and write it to ``output_dir``
+
+    Listings are exported with the default page size, as served live. A file cannot carry
+    the Link header of the next page, so a listing that spans several pages is not written
+    (a previous file is removed) and nginx falls back to Flask for it. Returns those URLs.
+    """
+    client = app.test_client()
+    live = []
+    for url, filename in PAGES.items():
+        path = os.path.join(output_dir, filename)
+        response = client.get(url)
+        if response.status_code != 200:
+            logger.warning("Static export skipped %s (HTTP %s)", url, response.status_code)
+            continue
+        if 'rel="next"' in response.headers.get('Link', ''):
+            for stale in (path, path + '.gz', path + '.br'):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            live.append(url)
+            continue
+        write_page(path, response.get_data())
+    return live
+
+
+def export_assets(app, output_dir):
+    """Mirror static/ with the precompressed variants of the text assets
+
+    Unchanged files are not copied again and files removed from static/ are
+    removed from the export.
+    """
+    root = app.static_folder
+    target_root = os.path.join(output_dir, 'static')
+    assets.manifest.build(root)
+
+    exported = set()
+    for filename, asset in assets.manifest.items(root):
+        source = os.path.join(root, filename)
+        if not os.path.exists(source):
+            continue  # Deleted since it was fingerprinted
+        target = os.path.join(target_root, filename)
+        exported.update({target, target + '.gz', target + '.br'})
+        try:
+            stat = os.stat(target)
+            if stat.st_size == asset.size and stat.st_mtime == asset.mtime:
+                continue
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(source, target + '.tmp')
+        os.replace(target + '.tmp', target)
+        _write_variant(target + '.gz', asset.gzip_body, asset.size)
+        _write_variant(target + '.br', asset.br_body, asset.size)
+
+    for directory, _, filenames in os.walk(target_root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if path not in exported:
+                os.remove(path)
+
+
+def export_site(app, output_dir):
+    """Write the whole public site to ``output_dir``, returning the URLs left to Flask"""
+    images.wait_for_variants()
+    export_assets(app, output_dir)
+    return export_pages(app, output_dir)
+
+
+# ============================================================================
+# RE-EXPORT AFTER CONTENT CHANGES
+# ============================================================================
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+_export_pending = threading.Event()
+
+
+def _export(app, output_dir):
+    _export_pending.clear()
+    try:
+        export_site(app, output_dir)
+    except Exception:
+        logger.exception("Static export failed")
+
+
+def schedule_export(app, output_dir):
+    """Queue a re-export, coalescing the changes made while one is pending"""
+    if not _export_pending.is_set():
+        _export_pending.set()
+        return _executor.submit(_export, app, output_dir)
+    return None
+
+
+def init_app(app):
+    """Re-export the site after every content change when STATIC_EXPORT_DIR is set"""
+    if config.STATIC_EXPORT_DIR:
+        on_content_change(lambda: schedule_export(app, config.STATIC_EXPORT_DIR))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    output_dir = os.path.abspath(argv[0] if argv else config.STATIC_EXPORT_DIR or 'export')
+
+    from app import app
+    print(f"Exporting the public site to {output_dir}...")
+    live = export_site(app, output_dir)
+
+    files = sum(len(filenames) for _, _, filenames in os.walk(output_dir))
+    print(f"\n✅ Static export completed: {files} files")
+    for url in live:
+        print(f"   {url} has more than API_PAGE_SIZE ({config.API_PAGE_SIZE}) items: "
+              f"not exported, served by Flask with its Link header")
+    print("   Serve it with nginx (gzip_static/brotli_static) and proxy /admin, /auth and API writes to Flask")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
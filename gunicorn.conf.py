@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+# Loaded automatically by "gunicorn app:app" from the working directory
+from server_config import server_settings
+
+globals().update(server_settings('gunicorn'))
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Image processing pipeline for admin uploads
+The upload is decoded, stripped of EXIF/XMP metadata and stored as a WebP master;
+resized WebP/AVIF variants and a tiny blur placeholder are then generated by a
+background worker pool and described in a manifest used to build srcset attributes.
+Publishing a manifest touches the variants folder, whose mtime is part of the cache key
+of the pages that embed srcsets, so only those are re-rendered
+"""
+
+import base64
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, url_for
+from config import config
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional, uploads are then stored untouched
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_WIDTH = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def available() -> bool:
+    """True when Pillow is installed and uploads can be processed"""
+    return Image is not None
+
+
+def variant_formats():
+    """Formats generated for every width, AVIF only when Pillow was built with it"""
+    return ('avif', 'webp') if features.check('avif') else ('webp',)
+
+
+def variants_dir(folder, stem):
+    return os.path.join(folder, 'variants', stem)
+
+
+def variants_generation(upload_folder) -> int:
+    """Token that changes whenever a manifest is published under ``upload_folder`` (0 before any)"""
+    try:
+        return os.stat(os.path.join(upload_folder, 'variants')).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def save_master(file, upload_folder, stem):
+    """Decode the upload and store a metadata-free WebP master, returning its filename
+
+    Returns None for animated images, which are kept as uploaded.
+    """
+    with Image.open(file.stream) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        max_width = max(config.IMAGE_VARIANT_WIDTHS)
+        image.thumbnail((max_width, max_width * 4), Image.LANCZOS)
+
+        filename = f"{stem}.webp"
+        # Only the colour profile is carried over, EXIF/XMP (GPS, camera...) are dropped
+        image.save(os.path.join(upload_folder, filename), 'WEBP',
+                   quality=config.IMAGE_QUALITY, icc_profile=image.info.get('icc_profile'))
+    return filename
+
+
+def build_variants(master_path, rel_dir, stem):
+    """Generate the resized variants and the placeholder of a master image"""
+    folder = variants_dir(os.path.dirname(master_path), stem)
+    os.makedirs(folder, exist_ok=True)
+
+    with Image.open(master_path) as image:
+        image.load()
+        width, height = image.size
+        manifest = {'width': width, 'height': height, 'variants': {}}
+
+        widths = sorted({w for w in config.IMAGE_VARIANT_WIDTHS if w < width} | {width})
+        for fmt in variant_formats():
+            manifest['variants'][fmt] = []
+            for variant_width in widths:
+                resized = image if variant_width == width else \
+                    image.resize((variant_width, round(height * variant_width / width)), Image.LANCZOS)
+                filename = f"{variant_width}.{fmt}"
+                resized.save(os.path.join(folder, filename), fmt.upper(), quality=config.IMAGE_QUALITY)
+                manifest['variants'][fmt].append([variant_width, f"{rel_dir}/variants/{stem}/{filename}"])
+
+        tiny = image.copy()
+        tiny.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+        buffer = io.BytesIO()
+        tiny.save(buffer, 'WEBP', quality=30)
+        manifest['placeholder'] = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+    # Write atomically: templates may read the manifest at any time
+    manifest_path = os.path.join(folder, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    # New generation for the pages showing this image; other cached responses stay valid
+    os.utime(os.path.dirname(folder))
+
+
+def _executor_instance():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.IMAGE_WORKERS, thread_name_prefix='images')
+        return _executor
+
+
+def _log_failure(future):
+    _pending.discard(future)
+    if future.exception() is not None:
+        logger.error("Image variant generation failed", exc_info=future.exception())
+
+
+def process_upload(file, upload_folder, stem):
+    """Store the master image and queue its variants; returns the stored filename or None"""
+    filename = save_master(file, upload_folder, stem)
+    if filename is None:
+        return None
+    rel_dir = os.path.basename(os.path.normpath(upload_folder))
+    future = _executor_instance().submit(build_variants, os.path.join(upload_folder, filename), rel_dir, stem)
+    _pending.add(future)
+    future.add_done_callback(_log_failure)
+    return filename
+
+
+def wait_for_variants(timeout=None):
+    """Block until every queued variant job is done (used by tests and the static export)"""
+    for future in list(_pending):
+        future.result(timeout=timeout)
+
+
+# ============================================================================
+# TEMPLATE HELPER
+# ============================================================================
+
+_manifest_cache = {}
+
+
+def load_manifest(path):
+    """Manifest of a static image path, or None if it has no variants (yet)"""
+    if not path:
+        return None
+    directory, filename = os.path.split(path)
+    stem = os.path.splitext(filename)[0]
+    manifest_path = os.path.join(variants_dir(os.path.join(current_app.static_folder, directory), stem),
+                                 'manifest.json')
+    try:
+        mtime = os.stat(manifest_path).st_mtime
+    except OSError:
+        return None
+
+    cached = _manifest_cache.get(manifest_path)
+    if cached is None or cached[0] != mtime:
+        with open(manifest_path) as f:
+            cached = (mtime, json.load(f))
+        _manifest_cache[manifest_path] = cached
+    return cached[1]
+
+
+def responsive_image(path):
+    """srcset strings, intrinsic size and placeholder for an image, or None"""
+    manifest = load_manifest(path)
+    if manifest is None:
+        return None
+    srcsets = {
+        fmt: ', '.join(f"{url_for('static', filename=rel)} {width}w" for width, rel in variants)
+        for fmt, variants in manifest['variants'].items()
+    }
+    return {
+        'width': manifest['width'],
+        'height': manifest['height'],
+        'placeholder': manifest['placeholder'],
+        'avif_srcset': srcsets.get('avif'),
+        'webp_srcset': srcsets.get('webp'),
+    }
+
+
+def init_app(app):
+    app.jinja_env.globals['responsive_image'] = responsive_image
@@ -1,20 +1,59 @@
 """
 Database initialization script
-Populates the database with initial portfolio data and creates default admin user
+Brings the schema up to date with the migrations in migrations/ (without touching
+existing data) and, on an empty database, adds the initial portfolio data and the
+default admin user
+
+Usage: python init_db.py [--reset]   (--reset drops every table first)
 """
+import sys
+
+from flask_migrate import stamp, upgrade
+from sqlalchemy import inspect
+
 from app import app
+from cache import bump_content_version
 from models import db, User, Profile, Skill, Project, ProjectTag, SocialLink
 
+# Revision matching the tables created by db.create_all() before migrations existed
+BASELINE_REVISION = '0001_baseline'
+
+
+def migrate_database():
+    """Apply the pending migrations (online: tables and data are kept)"""
+    tables = set(inspect(db.engine).get_table_names())
+    if 'alembic_version' not in tables and 'projects' in tables:
+        print("Existing database without migration history, marking it as the baseline schema...")
+        stamp(revision=BASELINE_REVISION)
+    print("Applying migrations...")
+    upgrade()
+
+
+def reset_database():
+    """Drop every table and recreate the current schema (all data is lost)"""
+    print("Dropping all tables...")
+    db.drop_all()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+
+    print("Creating all tables...")
+    db.create_all()
+    stamp()  # The models are the latest revision
+
 
-def init_database():
+def init_database(reset=False):
     """Initialize database with portfolio data"""
     with app.app_context():
-        # Drop all tables and recreate
-        print("Dropping all tables...")
-        db.drop_all()
+        if reset:
+            reset_database()
+        else:
+            migrate_database()
+        # Responses cached by the file/redis backends outlive the process: drop them with the old schema
+        bump_content_version()
 
-        print("Creating all tables...")
-        db.create_all()
+        if db.session.query(User.query.exists()).scalar():
+            print("\n✅ Database schema up to date (data already present, nothing added)")
+            return
 
         # Create default admin user
         print("Creating default admin user...")
@@ -195,4 +234,4 @@ def init_database():
 
 
 if __name__ == '__main__':
-    init_database()
+    init_database(reset='--reset' in sys.argv[1:])
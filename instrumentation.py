@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Per-request instrumentation
+Counts the SQL statements executed while handling each request and times the
+database, template rendering, serialization and compression work, so that N+1
+regressions show up in tests, in the X-Query-Count debug header and in the
+Server-Timing header. The same timings are aggregated into per-endpoint histograms
+and exposed with the connection pool checkout/wait metrics on /admin/metrics
+"""
+
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request, before_render_template, template_rendered
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from config import config
+from models import db
+
+# Server-Timing metric name -> description
+TIMINGS = {
+    'db': 'Database',
+    'render': 'Templates',
+    'serialize': 'JSON serialization',
+    'compress': 'Response compression',
+}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """Increment the query counter of the current request"""
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is not None and has_app_context():
+        add_time('db', time.perf_counter() - start)
+
+
+def query_count() -> int:
+    """Number of SQL statements executed so far in the current request"""
+    return g.get('query_count', 0)
+
+
+def add_time(name: str, seconds: float):
+    """Add ``seconds`` to the ``name`` timing of the current request"""
+    timings = g.setdefault('timings', {})
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name: str):
+    """Time a block as part of the ``name`` timing of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_app_context():
+            add_time(name, time.perf_counter() - start)
+
+
+def start_request():
+    g.request_start = time.perf_counter()
+
+
+def _render_started(app, template, context, **extra):
+    g.setdefault('render_starts', []).append(time.perf_counter())
+
+
+def _render_finished(app, template, context, **extra):
+    starts = g.get('render_starts')
+    if starts:
+        start = starts.pop()
+        if not starts:  # Templates rendered from templates are already counted
+            add_time('render', time.perf_counter() - start)
+
+
+def server_timing(timings: dict, queries: int, total: float = None) -> str:
+    """Server-Timing header value for the timings of one request"""
+    entries = []
+    for name, description in TIMINGS.items():
+        if name == 'db' and (queries or name in timings):
+            entries.append(f'db;dur={timings.get(name, 0.0) * 1000:.2f};desc="{queries} queries"')
+        elif name in timings:
+            entries.append(f'{name};dur={timings[name] * 1000:.2f};desc="{description}"')
+    if total is not None:
+        entries.append(f'app;dur={total * 1000:.2f};desc="Total"')
+    return ', '.join(entries)
+
+
+def init_app(app):
+    """Time every request, adding the X-Query-Count header in debug and testing mode and
+    Server-Timing when SERVER_TIMING is enabled, and start collecting pool metrics for the
+    application's engines"""
+    with app.app_context():
+        for engine in db.engines.values():
+            attach_pool_metrics(engine)
+
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.before_request(start_request)
+
+    @app.after_request
+    def record_request(response):
+        timings = g.get('timings', {})
+        queries = query_count()
+        start = g.get('request_start')
+        total = time.perf_counter() - start if start is not None else None
+        request_metrics.observe(request.endpoint or 'unmatched', timings, queries, total)
+
+        if app.debug or app.testing:
+            response.headers['X-Query-Count'] = str(queries)
+        if config.SERVER_TIMING:
+            response.headers['Server-Timing'] = server_timing(timings, queries, total)
+        return response
+
+
+# ============================================================================
+# REQUEST HISTOGRAMS
+# ============================================================================
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per endpoint"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # endpoint -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(endpoint, [0] * (len(self.buckets) + 1) + [0.0])
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {endpoint: list(values) for endpoint, values in self._series.items()}
+        for endpoint, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {values[-1]}')
+            lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {cumulative}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class RequestMetrics:
+    """Per-endpoint histograms of the request timings (per worker process)"""
+
+    def __init__(self):
+        self.duration = Histogram('portfolio_request_duration_seconds',
+                                  'Time spent in the application per request', SECONDS_BUCKETS)
+        self.timings = {name: Histogram(f'portfolio_request_{name}_seconds', f'{description} time per request',
+                                        SECONDS_BUCKETS)
+                        for name, description in TIMINGS.items()}
+        self.queries = Histogram('portfolio_request_queries', 'SQL statements per request', QUERY_BUCKETS)
+
+    def observe(self, endpoint, timings, queries, total=None):
+        if total is not None:
+            self.duration.observe(endpoint, total)
+        for name, histogram in self.timings.items():
+            histogram.observe(endpoint, timings.get(name, 0.0))
+        self.queries.observe(endpoint, queries)
+
+    def histograms(self):
+        return [self.duration, *self.timings.values(), self.queries]
+
+    def render(self):
+        return [line for histogram in self.histograms() for line in histogram.render()]
+
+    def reset(self):
+        for histogram in self.histograms():
+            histogram.reset()
+
+
+request_metrics = RequestMetrics()
+
+
+# ============================================================================
+# CONNECTION POOL METRICS
+# ============================================================================
+
+class PoolMetrics:
+    """Cumulative checkout statistics of one connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    metrics = None  # Assigned by attach_pool_metrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        if self.metrics is None:
+            return super().connect()
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.increment('timeouts')
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+
+def instrument_pool(engine_options: dict) -> dict:
+    """Add the timed pool class to engine options that use the default pool"""
+    options = dict(engine_options)
+    options.setdefault('poolclass', TimedQueuePool)
+    return options
+
+
+_engine_metrics = weakref.WeakKeyDictionary()
+
+
+def attach_pool_metrics(engine) -> PoolMetrics:
+    """Start collecting pool metrics for ``engine`` (idempotent)"""
+    if engine in _engine_metrics:
+        return _engine_metrics[engine]
+
+    metrics = PoolMetrics()
+    _engine_metrics[engine] = metrics
+    if isinstance(engine.pool, TimedQueuePool):
+        engine.pool.metrics = metrics
+
+    event.listen(engine, 'connect', lambda *args: metrics.increment('connects'))
+    event.listen(engine, 'checkout', lambda *args: metrics.increment('checkouts'))
+    event.listen(engine, 'checkin', lambda *args: metrics.increment('checkins'))
+    event.listen(engine, 'invalidate', lambda *args: metrics.increment('invalidations'))
+    return metrics
+
+
+def pool_stats(engines) -> dict:
+    """Current pool gauges and cumulative counters for every engine, by bind key"""
+    stats = {}
+    for bind_key, engine in engines.items():
+        pool = engine.pool
+        metrics = attach_pool_metrics(engine)
+        entry = {
+            'connects': metrics.connects,
+            'checkouts': metrics.checkouts,
+            'checkins': metrics.checkins,
+            'invalidations': metrics.invalidations,
+            'timeouts': metrics.timeouts,
+            'wait_seconds': metrics.wait_seconds,
+            'max_wait_seconds': metrics.max_wait_seconds,
+        }
+        if isinstance(pool, QueuePool):
+            entry.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': pool.overflow(),
+            })
+        stats[bind_key or 'default'] = entry
+    return stats
+
+
+def render_metrics(engines) -> str:
+    """Render the pool statistics and the request histograms in the Prometheus text exposition format"""
+    stats = pool_stats(engines)
+    names = sorted({name for entry in stats.values() for name in entry})
+    lines = []
+    for name in names:
+        counter = name in ('connects', 'checkouts', 'checkins', 'invalidations', 'timeouts', 'wait_seconds')
+        metric = f"portfolio_db_pool_{name}" + ('_total' if counter else '')
+        lines.append(f"# TYPE {metric} {'counter' if counter else 'gauge'}")
+        for bind, entry in sorted(stats.items()):
+            if name in entry:
+                lines.append(f'{metric}{{bind="{bind}"}} {entry[name]}')
+    lines.extend(request_metrics.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+JSON provider of the application
+Encodes and decodes with orjson when it is installed and falls back to Flask's
+standard library provider otherwise, or for the arguments orjson does not support.
+The output matches the default provider (sorted keys, dates as HTTP dates) except
+that non-ASCII characters are written as UTF-8 instead of \\u escapes.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library json module is always available
+    orjson = None
+
+# Keyword arguments of json.dumps() that have an orjson equivalent (or none is needed)
+ORJSON_ARGUMENTS = {'default', 'ensure_ascii', 'sort_keys', 'indent', 'separators'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider encoding with orjson"""
+
+    def _orjson_options(self, kwargs):
+        """orjson option flags for json.dumps() arguments, None if they need the standard library"""
+        if orjson is None or not ORJSON_ARGUMENTS.issuperset(kwargs):
+            return None
+        if kwargs.get('indent') not in (None, 2) or kwargs.get('separators') not in (None, (',', ':')):
+            return None
+        # Datetimes go through default() to keep Flask's HTTP date format
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            options |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, **kwargs) -> bytes:
+        """Serialize ``obj`` to UTF-8 encoded JSON, without a str round-trip with orjson"""
+        options = self._orjson_options(kwargs)
+        if options is not None:
+            try:
+                return orjson.dumps(obj, default=kwargs.get('default', self.default), option=options)
+            except orjson.JSONEncodeError:
+                pass  # e.g. integers beyond 64 bits: the standard library handles them
+        return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        if self._orjson_options(kwargs) is None:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Login throttling and bounded password verification
+Failed logins are counted per client IP and per username and further attempts are
+rejected before any hashing; bcrypt checks run on a small thread pool with at most
+LOGIN_HASH_QUEUE checks queued, so that a credential-stuffing burst cannot occupy every
+CPU, and a login waits at most LOGIN_HASH_TIMEOUT seconds for its result
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Deque, Dict
+
+from config import config
+from models import bcrypt, User
+
+MAX_TRACKED_KEYS = 10000
+
+
+class LoginBusy(Exception):
+    """Raised when too many password checks are already in flight"""
+
+
+class RateLimiter:
+    """Sliding-window counter of failed attempts per key (per worker process)"""
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self._attempts: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, key, now):
+        attempts = self._attempts.get(key)
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if attempts is not None and not attempts:
+            del self._attempts[key]
+        return attempts
+
+    def retry_after(self, key: str) -> int:
+        """Seconds until ``key`` may try again, 0 when it is not limited"""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._expire(key, now)
+            if not attempts or len(attempts) < self.limit:
+                return 0
+            return max(1, int(attempts[-self.limit] + self.window - now) + 1)
+
+    def hit(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.pop(key, None) or deque(maxlen=self.limit)
+            attempts.append(now)
+            # Keys are kept in order of their latest failure, so the first one is the least
+            # recently seen: dropping it bounds memory even when every key is still fresh
+            while len(self._attempts) >= MAX_TRACKED_KEYS:
+                del self._attempts[next(iter(self._attempts))]
+            self._attempts[key] = attempts
+
+    def reset(self, key: str = None):
+        with self._lock:
+            if key is None:
+                self._attempts.clear()
+            else:
+                self._attempts.pop(key, None)
+
+
+ip_limiter = RateLimiter(config.LOGIN_MAX_FAILURES_PER_IP, config.LOGIN_RATE_WINDOW)
+user_limiter = RateLimiter(config.LOGIN_MAX_FAILURES_PER_USER, config.LOGIN_RATE_WINDOW)
+
+
+def _user_key(username):
+    return (username or '').strip().lower()
+
+
+def retry_after(ip, username) -> int:
+    """Seconds the client must wait before the next attempt (0 = allowed)"""
+    return max(ip_limiter.retry_after(ip), user_limiter.retry_after(_user_key(username)))
+
+
+def record_failure(ip, username):
+    ip_limiter.hit(ip)
+    user_limiter.hit(_user_key(username))
+
+
+def record_success(username):
+    user_limiter.reset(_user_key(username))
+
+
+def reset():
+    """Forget every recorded failure"""
+    ip_limiter.reset()
+    user_limiter.reset()
+
+
+# ============================================================================
+# BOUNDED PASSWORD VERIFICATION
+# ============================================================================
+
+_executor = ThreadPoolExecutor(max_workers=config.LOGIN_HASH_WORKERS, thread_name_prefix='bcrypt')
+_slots = threading.BoundedSemaphore(config.LOGIN_HASH_QUEUE)
+
+
+def _check_and_rehash(password_hash, password, rehash):
+    """Runs on the pool with plain values (no ORM object crosses threads)"""
+    if not bcrypt.check_password_hash(password_hash, password):
+        return False, None
+    return True, (User.hash_password(password) if rehash else None)
+
+
+def verify_password(user, password) -> bool:
+    """Check ``password`` on the hashing pool, rehashing it when the cost factor was raised
+
+    Raises LoginBusy without hashing when LOGIN_HASH_QUEUE checks are already queued or
+    running, and when the result takes more than LOGIN_HASH_TIMEOUT seconds.
+    """
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise LoginBusy()
+    future = _executor.submit(_check_and_rehash, user.password_hash, password, user.password_needs_rehash())
+    # The slot is held until the check is done, even if this request stopped waiting
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        valid, new_hash = future.result(timeout=config.LOGIN_HASH_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        raise LoginBusy()
+    if new_hash:
+        # Transparent cost upgrade, saved with the login's last_login update
+        user.password_hash = new_hash
+    return valid
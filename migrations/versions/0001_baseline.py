@@ -0,0 +1,98 @@
+"""Baseline schema
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:20:48.114755
+
+The schema created by db.create_all() before migrations were introduced: databases
+created that way are stamped with this revision by init_db.py and upgraded from here.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('profile',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('lead_text', sa.Text(), nullable=False),
+    sa.Column('description_1', sa.Text(), nullable=True),
+    sa.Column('description_2', sa.Text(), nullable=True),
+    sa.Column('years_experience', sa.Integer(), nullable=True),
+    sa.Column('cv_url', sa.String(length=500), nullable=True),
+    sa.Column('profile_image', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('projects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('image_url', sa.String(length=500), nullable=True),
+    sa.Column('demo_url', sa.String(length=500), nullable=True),
+    sa.Column('github_url', sa.String(length=500), nullable=True),
+    sa.Column('display_order', sa.Integer(), nullable=True),
+    sa.Column('animation_delay', sa.String(length=10), nullable=True),
+    sa.Column('is_published', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('skills',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('icon_class', sa.String(length=100), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=True),
+    sa.Column('proficiency_level', sa.Integer(), nullable=True),
+    sa.Column('display_order', sa.Integer(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('social_links',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('platform_name', sa.String(length=100), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=False),
+    sa.Column('icon_class', sa.String(length=100), nullable=False),
+    sa.Column('display_order', sa.Integer(), nullable=True),
+    sa.Column('animation_delay', sa.String(length=10), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_login', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('project_tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('color_class', sa.String(length=50), nullable=True),
+    sa.Column('display_order', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('project_tags')
+    op.drop_table('users')
+    op.drop_table('social_links')
+    op.drop_table('skills')
+    op.drop_table('projects')
+    op.drop_table('profile')
@@ -0,0 +1,35 @@
+"""Indexes for the filter and sort columns
+
+Revision ID: 0002_listing_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:20:58.549521
+
+Composite indexes for the public listings, which filter on is_active/is_published and sort
+by display_order, and for the tags loaded by project_id. InnoDB adds secondary indexes
+in place without locking the tables, so this can be applied to a live database.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_listing_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_projects_published_order', 'projects', ['is_published', 'display_order']),
+    ('ix_skills_active_order', 'skills', ['is_active', 'display_order']),
+    ('ix_social_links_active_order', 'social_links', ['is_active', 'display_order']),
+    ('ix_project_tags_project_order', 'project_tags', ['project_id', 'display_order']),
+)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
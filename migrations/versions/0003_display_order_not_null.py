@@ -0,0 +1,35 @@
+"""Make display_order of the paginated listings NOT NULL
+
+Revision ID: 0003_display_order_not_null
+Revises: 0002_listing_indexes
+Create Date: 2026-10-18 15:02:11.407316
+
+Skills and projects are keyset-paginated on (display_order, id): a NULL sort key cannot be
+encoded in a cursor and is never matched by the cursor comparison, so such rows would be
+missing from every page after the first. Existing NULLs become 0 (the model default).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_display_order_not_null'
+down_revision = '0002_listing_indexes'
+branch_labels = None
+depends_on = None
+
+TABLES = ('skills', 'projects')
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(f"UPDATE {table} SET display_order = 0 WHERE display_order IS NULL")
+        # Batch mode recreates the table on SQLite, which cannot alter a column in place
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('display_order', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('display_order', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,30 @@
+"""Time of the last removal of a published project
+
+Revision ID: 0004_content_removal
+Revises: 0003_display_order_not_null
+Create Date: 2026-10-18 16:41:37.902114
+
+A deleted or unpublished project no longer counts in max(updated_at) of the published
+rows, so the sitemap lastmod also reads the time recorded here (a single row).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_content_removal'
+down_revision = '0003_display_order_not_null'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('content_removal',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('removed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('content_removal')
@@ -6,8 +6,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from flask_bcrypt import Bcrypt
 from datetime import datetime
+from sqlalchemy import event, inspect
+from config import config
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bcrypt = Bcrypt()
 
 
@@ -23,14 +26,26 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
 
+    @staticmethod
+    def hash_password(password):
+        """bcrypt hash of password with the configured cost factor"""
+        return bcrypt.generate_password_hash(password, config.BCRYPT_LOG_ROUNDS).decode('utf-8')
+
     def set_password(self, password):
-        """Hash password using bcrypt"""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hash password using bcrypt with the configured cost factor"""
+        self.password_hash = self.hash_password(password)
 
     def check_password(self, password):
         """Verify password against hash"""
         return bcrypt.check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        """True when the hash was made with a lower cost factor than BCRYPT_LOG_ROUNDS"""
+        try:
+            return int(self.password_hash.split('$')[2]) < config.BCRYPT_LOG_ROUNDS
+        except (IndexError, ValueError):
+            return True
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -73,13 +88,15 @@ class Profile(db.Model):
 class Skill(db.Model):
     """Store technical skills/technologies"""
     __tablename__ = 'skills'
+    # Public listings filter on is_active and sort by display_order
+    __table_args__ = (db.Index('ix_skills_active_order', 'is_active', 'display_order'),)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     icon_class = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(50))  # OS, Language, Framework, Tool, etc.
     proficiency_level = db.Column(db.Integer)  # 1-5 (optional)
-    display_order = db.Column(db.Integer, default=0)
+    display_order = db.Column(db.Integer, nullable=False, default=0)
     is_active = db.Column(db.Boolean, default=True)
 
     def to_dict(self):
@@ -96,6 +113,8 @@ class Skill(db.Model):
 class Project(db.Model):
     """Store portfolio projects"""
     __tablename__ = 'projects'
+    # Public listings filter on is_published and sort (keyset-paginate) by display_order, id
+    __table_args__ = (db.Index('ix_projects_published_order', 'is_published', 'display_order'),)
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -103,14 +122,16 @@ class Project(db.Model):
     image_url = db.Column(db.String(500))
     demo_url = db.Column(db.String(500))
     github_url = db.Column(db.String(500))
-    display_order = db.Column(db.Integer, default=0)
+    display_order = db.Column(db.Integer, nullable=False, default=0)
     animation_delay = db.Column(db.String(10), default='0s')  # e.g., '0.2s'
     is_published = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Relationship
-    tags = db.relationship('ProjectTag', backref='project', lazy=True, cascade='all, delete-orphan')
+    # Relationship - tags come back already sorted by the database; list views
+    # should batch-load them with selectinload(Project.tags) to avoid N+1 queries
+    tags = db.relationship('ProjectTag', backref='project', lazy=True, cascade='all, delete-orphan',
+                           order_by='ProjectTag.display_order, ProjectTag.id')
 
     def to_dict(self):
         return {
@@ -126,10 +147,58 @@ class Project(db.Model):
             'tags': [tag.to_dict() for tag in self.tags]
         }
 
+    def sync_tags(self, tags_data):
+        """Reconcile tags with a list of {'name', 'color_class', 'display_order'} dicts
+
+        Existing rows are matched by name: unchanged tags are not touched, changed
+        ones are updated in place, new ones inserted and missing ones deleted.
+        Any change also moves updated_at, which the tag rows alone would not.
+        Returns True if anything changed.
+        """
+        current = {}
+        removed = []
+        for tag in self.tags:
+            if tag.name in current:
+                removed.append(tag)  # Duplicate name left over from older edits
+            else:
+                current[tag.name] = tag
+
+        changed = False
+        wanted = set()
+        for tag_data in tags_data:
+            name = tag_data['name']
+            if name in wanted:
+                continue
+            wanted.add(name)
+            color_class = tag_data.get('color_class', 'bg-primary')
+            display_order = tag_data.get('display_order', 0)
+
+            tag = current.get(name)
+            if tag is None:
+                self.tags.append(ProjectTag(name=name, color_class=color_class, display_order=display_order))
+                changed = True
+                continue
+            if tag.color_class != color_class:
+                tag.color_class = color_class
+                changed = True
+            if tag.display_order != display_order:
+                tag.display_order = display_order
+                changed = True
+
+        removed += [tag for name, tag in current.items() if name not in wanted]
+        for tag in removed:
+            self.tags.remove(tag)  # delete-orphan cascade deletes the row
+        changed = changed or bool(removed)
+        if changed:
+            self.updated_at = datetime.utcnow()
+        return changed
+
 
 class ProjectTag(db.Model):
     """Store tags/badges for projects"""
     __tablename__ = 'project_tags'
+    # Tags are loaded by project, already sorted
+    __table_args__ = (db.Index('ix_project_tags_project_order', 'project_id', 'display_order'),)
 
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -145,10 +214,25 @@ class ProjectTag(db.Model):
             'display_order': self.display_order
         }
 
+    @staticmethod
+    def parse_input(tags_input):
+        """Parse the admin form format "Python:bg-primary, Flask" into tag dicts"""
+        tags_data = []
+        tags_list = [tag.strip() for tag in (tags_input or '').split(',') if tag.strip()]
+        for idx, tag_name in enumerate(tags_list):
+            # Estrai colore se specificato (formato: "Python:bg-primary")
+            if ':' in tag_name:
+                tag_name, color = tag_name.split(':', 1)
+            else:
+                color = 'bg-primary'
+            tags_data.append({'name': tag_name.strip(), 'color_class': color.strip(), 'display_order': idx})
+        return tags_data
+
 
 class SocialLink(db.Model):
     """Store social media and profile links"""
     __tablename__ = 'social_links'
+    __table_args__ = (db.Index('ix_social_links_active_order', 'is_active', 'display_order'),)
 
     id = db.Column(db.Integer, primary_key=True)
     platform_name = db.Column(db.String(100), nullable=False)
@@ -167,3 +251,40 @@ class SocialLink(db.Model):
             'display_order': self.display_order,
             'animation_delay': self.animation_delay
         }
+
+
+class ContentRemoval(db.Model):
+    """Single row holding when a published project was last deleted or unpublished
+
+    Such a project takes its updated_at out of the published rows, so the time is kept
+    here for the sitemap lastmod. It is written by the flush that removes the project.
+    """
+    __tablename__ = 'content_removal'
+
+    id = db.Column(db.Integer, primary_key=True)
+    removed_at = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def record(cls, session):
+        with session.no_autoflush:
+            row = session.get(cls, 1)
+        if row is None:
+            session.add(cls(id=1, removed_at=datetime.utcnow()))
+        else:
+            row.removed_at = datetime.utcnow()
+
+
+def _was_published(project):
+    """True if ``project`` was published before the pending changes"""
+    history = inspect(project).attrs.is_published.history
+    return bool(history.deleted[0]) if history.deleted else bool(project.is_published)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _record_removed_projects(session, flush_context, instances):
+    # Bulk DELETE statements bypass the session: the batch endpoint records them itself
+    deleted = session.deleted
+    for item in (*deleted, *session.dirty):
+        if isinstance(item, Project) and _was_published(item) and (item in deleted or not item.is_published):
+            ContentRemoval.record(session)
+            return
@@ -10,7 +10,11 @@ Admin dashboard routes for managing portfolio content
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy.orm import selectinload
 from models import db, Profile, Skill, Project, ProjectTag, SocialLink
+from cache import bump_content_version, get_dashboard_stats, get_upload_usage
+from instrumentation import render_metrics
+import images
 import os
 
 route_admin = Blueprint('admin', __name__, url_prefix='/admin')
@@ -35,6 +39,16 @@ def save_uploaded_file(file):
         upload_folder = current_app.config['UPLOAD_FOLDER']
         os.makedirs(upload_folder, exist_ok=True)
 
+        # Store a metadata-free WebP master; resized variants are built in the background
+        if images.available():
+            try:
+                processed = images.process_upload(file, upload_folder, os.path.splitext(filename)[0])
+            except (OSError, images.Image.DecompressionBombError):
+                return None  # Not a decodable image
+            if processed:
+                return f"img/{processed}"
+            file.stream.seek(0)
+
         filepath = os.path.join(upload_folder, filename)
         file.save(filepath)
 
@@ -47,14 +61,22 @@ def save_uploaded_file(file):
 @login_required
 def dashboard():
     """Admin dashboard home"""
-    # Statistiche
-    stats = {
-        'projects': Project.query.count(),
-        'skills': Skill.query.count(),
-        'social_links': SocialLink.query.count(),
-        'published_projects': Project.query.filter_by(is_published=True).count()
-    }
-    return render_template('admin/dashboard.html', stats=stats)
+    # Statistiche: una sola query aggregata, ricalcolata solo quando i contenuti cambiano
+    stats = get_dashboard_stats()
+    # Disk usage changes without a content change (background image variants): own TTL
+    uploads = get_upload_usage(current_app.config['UPLOAD_FOLDER'])
+    return render_template('admin/dashboard.html', stats=stats, uploads=uploads)
+
+
+@route_admin.route('/metrics')
+@login_required
+def metrics():
+    """Connection pool metrics and per-endpoint request histograms in Prometheus text format
+
+    Besides the pool gauges and counters of every bind, each endpoint reports its total
+    duration, the database/render/serialize/compress time and the SQL statement count.
+    """
+    return current_app.response_class(render_metrics(db.engines), mimetype='text/plain; version=0.0.4')
 
 
 # ============================================================================
@@ -99,6 +121,7 @@ def profile_edit():
     profile.profile_image = profile_image_url
 
     db.session.commit()
+    bump_content_version()
     flash('Profilo aggiornato con successo!', 'success')
     return redirect(url_for('admin.profile_manage'))
 
@@ -128,6 +151,7 @@ def skill_add():
     )
     db.session.add(skill)
     db.session.commit()
+    bump_content_version()
     flash('Skill aggiunta con successo!', 'success')
     return redirect(url_for('admin.skills_manage'))
 
@@ -144,6 +168,7 @@ def skill_edit(skill_id):
     skill.is_active = request.form.get('is_active') == 'on'
 
     db.session.commit()
+    bump_content_version()
     flash('Skill aggiornata con successo!', 'success')
     return redirect(url_for('admin.skills_manage'))
 
@@ -155,6 +180,7 @@ def skill_delete(skill_id):
     skill = Skill.query.get_or_404(skill_id)
     db.session.delete(skill)
     db.session.commit()
+    bump_content_version()
     flash('Skill eliminata con successo!', 'success')
     return redirect(url_for('admin.skills_manage'))
 
@@ -167,7 +193,7 @@ def skill_delete(skill_id):
 @login_required
 def projects_manage():
     """Manage projects"""
-    projects = Project.query.order_by(Project.display_order).all()
+    projects = Project.query.options(selectinload(Project.tags)).order_by(Project.display_order).all()
     return render_template('admin/projects.html', projects=projects)
 
 
@@ -198,29 +224,11 @@ def project_add():
             animation_delay=request.form.get('animation_delay', '0s'),
             is_published=request.form.get('is_published') == 'on'
         )
+        project.sync_tags(ProjectTag.parse_input(request.form.get('tags', '')))
         db.session.add(project)
-        db.session.flush()
-
-        # Aggiungi tags
-        tags_input = request.form.get('tags', '')
-        if tags_input:
-            tags_list = [tag.strip() for tag in tags_input.split(',') if tag.strip()]
-            for idx, tag_name in enumerate(tags_list):
-                # Estrai colore se specificato (formato: "Python:bg-primary")
-                if ':' in tag_name:
-                    tag_name, color = tag_name.split(':', 1)
-                else:
-                    color = 'bg-primary'
-
-                tag = ProjectTag(
-                    project_id=project.id,
-                    name=tag_name.strip(),
-                    color_class=color.strip(),
-                    display_order=idx
-                )
-                db.session.add(tag)
 
         db.session.commit()
+        bump_content_version()
         flash('Progetto aggiunto con successo!', 'success')
         return redirect(url_for('admin.projects_manage'))
 
@@ -255,27 +263,11 @@ def project_edit(project_id):
         project.animation_delay = request.form.get('animation_delay', project.animation_delay)
         project.is_published = request.form.get('is_published') == 'on'
 
-        # Aggiorna tags
-        ProjectTag.query.filter_by(project_id=project.id).delete()
-
-        tags_input = request.form.get('tags', '')
-        if tags_input:
-            tags_list = [tag.strip() for tag in tags_input.split(',') if tag.strip()]
-            for idx, tag_name in enumerate(tags_list):
-                if ':' in tag_name:
-                    tag_name, color = tag_name.split(':', 1)
-                else:
-                    color = 'bg-primary'
-
-                tag = ProjectTag(
-                    project_id=project.id,
-                    name=tag_name.strip(),
-                    color_class=color.strip(),
-                    display_order=idx
-                )
-                db.session.add(tag)
+        # Aggiorna tags (solo le differenze)
+        project.sync_tags(ProjectTag.parse_input(request.form.get('tags', '')))
 
         db.session.commit()
+        bump_content_version()
         flash('Progetto aggiornato con successo!', 'success')
         return redirect(url_for('admin.projects_manage'))
 
@@ -289,6 +281,7 @@ def project_delete(project_id):
     project = Project.query.get_or_404(project_id)
     db.session.delete(project)
     db.session.commit()
+    bump_content_version()
     flash('Progetto eliminato con successo!', 'success')
     return redirect(url_for('admin.projects_manage'))
 
@@ -319,6 +312,7 @@ def social_link_add():
     )
     db.session.add(link)
     db.session.commit()
+    bump_content_version()
     flash('Link social aggiunto con successo!', 'success')
     return redirect(url_for('admin.social_links_manage'))
 
@@ -336,6 +330,7 @@ def social_link_edit(link_id):
     link.is_active = request.form.get('is_active') == 'on'
 
     db.session.commit()
+    bump_content_version()
     flash('Link social aggiornato con successo!', 'success')
     return redirect(url_for('admin.social_links_manage'))
 
@@ -347,5 +342,6 @@ def social_link_delete(link_id):
     link = SocialLink.query.get_or_404(link_id)
     db.session.delete(link)
     db.session.commit()
+    bump_content_version()
     flash('Link social eliminato con successo!', 'success')
     return redirect(url_for('admin.social_links_manage'))
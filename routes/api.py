@@ -7,13 +7,170 @@
 API Routes for managing portfolio data dynamically
 Provides REST endpoints for CRUD operations on Profile, Skills, Projects, and Social Links
 All write operations (POST, PUT, DELETE) require authentication
+GET responses are served from a pre-serialized JSON cache that every write invalidates
 """
 
-from flask import Blueprint, jsonify, request
-from flask_login import login_required
-from models import db, Profile, Skill, Project, ProjectTag, SocialLink
+import base64
+from urllib.parse import urlencode
+
+from flask import Blueprint, jsonify, request, current_app, url_for
+from flask_login import login_required, current_user
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
+from models import db, Profile, Skill, Project, ProjectTag, SocialLink, ContentRemoval
+from cache import bump_content_version, content_changed_at, get_cached_body, cached_response, Payload
+from config import config
+from db_routing import prefer_replica
+from instrumentation import timed
 
 route_api = Blueprint('api', __name__, url_prefix='/api')
+route_api.before_request(prefer_replica)  # Public reads may use a read replica
+
+
+def dumps(data) -> bytes:
+    """Serialize data with the application's JSON provider"""
+    with timed('serialize'):
+        return current_app.json.dumps_bytes(data)
+
+
+def cached_json(key, build, private=False):
+    """Serve a GET endpoint from the JSON cache with ETag/Last-Modified revalidation"""
+    cached = get_cached_body(f"api:{key}", build, mimetype='application/json')
+    if cached is None:
+        return None
+    cache_control = 'private, no-cache' if private else public_cache_control()
+    return cached_response(cached, cache_control=cache_control)
+
+
+def public_cache_control():
+    if config.API_CACHE_MAX_AGE:
+        return f"public, max-age={config.API_CACHE_MAX_AGE}"
+    return 'public, no-cache'
+
+
+# ============================================================================
+# LISTING HELPERS (keyset pagination, sparse fieldsets, filters)
+# ============================================================================
+
+PROJECT_FIELDS = ('id', 'title', 'description', 'image_url', 'demo_url', 'github_url',
+                  'display_order', 'animation_delay', 'is_published', 'tags')
+SKILL_FIELDS = ('id', 'name', 'icon_class', 'category', 'proficiency_level', 'display_order')
+
+
+def parse_limit():
+    """Page size from ?limit=, capped at API_MAX_PAGE_SIZE"""
+    raw = request.args.get('limit')
+    if raw is None:
+        return min(config.API_PAGE_SIZE, config.API_MAX_PAGE_SIZE)
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("'limit' must be an integer")
+    if limit < 1:
+        raise ValueError("'limit' must be positive")
+    return min(limit, config.API_MAX_PAGE_SIZE)
+
+
+def parse_fields(allowed):
+    """Sparse fieldset from ?fields=a,b (None means every field)"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    # Canonical order, so equivalent requests share one cache entry
+    return tuple(name for name in allowed if name in requested)
+
+
+def parse_cursor():
+    """Validate ?cursor= and return it unchanged (None for the first page)"""
+    raw = request.args.get('cursor')
+    if raw:
+        decode_cursor(raw)
+    return raw or None
+
+
+def encode_cursor(item):
+    return base64.urlsafe_b64encode(f"{item.display_order}:{item.id}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(raw):
+    try:
+        order, item_id = base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)).decode().split(':')
+        return int(order), int(item_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def list_cache_key(name, params):
+    query = sorted((key, ','.join(value) if isinstance(value, tuple) else str(value))
+                   for key, value in params.items() if value is not None)
+    return f"{name}?{urlencode(query)}"
+
+
+def keyset_page(session, query, model, params):
+    """Fetch one page of rows ordered by (display_order, id), starting after the cursor"""
+    if params['cursor']:
+        order, last_id = decode_cursor(params['cursor'])
+        query = query.where(or_(model.display_order > order,
+                                and_(model.display_order == order, model.id > last_id)))
+    limit = params['limit']
+    rows = session.execute(query.order_by(model.display_order, model.id).limit(limit + 1)).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def display_order_error(model, data):
+    """Why ``data`` cannot set the keyset sort column of ``model``, or None"""
+    if 'display_order' not in data:
+        return None
+    return field_error(model, 'display_order', data['display_order'])
+
+
+# ============================================================================
+# COLUMN PROJECTIONS (API rows built from Row tuples, no ORM objects)
+# ============================================================================
+
+def projection(model, fields, extra=()):
+    """SELECT of the ``fields`` columns of ``model`` followed by the ``extra`` ones
+
+    The first len(fields) values of every row are the serialized fields, in order.
+    """
+    names = tuple(dict.fromkeys((*fields, *extra)))
+    return select(*(getattr(model, name) for name in names))
+
+
+def rows_to_dicts(rows, fields):
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def project_tags(session, project_ids):
+    """Tags of the given projects as dicts, by project id, in the relationship's order"""
+    tags = {project_id: [] for project_id in project_ids}
+    if not project_ids:
+        return tags
+    query = (select(ProjectTag.project_id, ProjectTag.id, ProjectTag.name, ProjectTag.color_class,
+                    ProjectTag.display_order)
+             .where(ProjectTag.project_id.in_(project_ids))
+             .order_by(ProjectTag.project_id, ProjectTag.display_order, ProjectTag.id))
+    for project_id, tag_id, name, color_class, display_order in session.execute(query):
+        tags[project_id].append({'id': tag_id, 'name': name, 'color_class': color_class,
+                                 'display_order': display_order})
+    return tags
+
+
+def page_payload(data, params, next_cursor, last_modified=None):
+    """Serialize a page, advertising the next one in a Link header"""
+    headers = ()
+    if next_cursor:
+        args = {key: ','.join(value) if isinstance(value, tuple) else value
+                for key, value in params.items() if value is not None}
+        args['cursor'] = next_cursor
+        headers = (('Link', f'<{url_for(request.endpoint, **args)}>; rel="next"'),)
+    return Payload(dumps(data), last_modified, headers)
 
 
 # ============================================================================
@@ -23,12 +180,21 @@ route_api = Blueprint('api', __name__, url_prefix='/api')
 @route_api.route('/profile', methods=['GET'])
 def get_profile():
     """Get profile information"""
-    profile = Profile.query.first()
-    if profile:
-        return jsonify(profile.to_dict())
+    response = cached_json('profile', build_profile_json)
+    if response is not None:
+        return response
     return jsonify({'message': 'Profile not found'}), 404
 
 
+def build_profile_json(session=None):
+    profile = (session or db.session).query(Profile).first()
+    if not profile:
+        return None
+    with timed('serialize'):
+        data = profile.to_dict()
+    return Payload(dumps(data), profile.updated_at)
+
+
 @route_api.route('/profile', methods=['PUT'])
 @login_required
 def update_profile():
@@ -46,6 +212,7 @@ def update_profile():
     profile.cv_url = data.get('cv_url', profile.cv_url)
 
     db.session.commit()
+    bump_content_version()
     return jsonify(profile.to_dict())
 
 
@@ -55,9 +222,39 @@ def update_profile():
 
 @route_api.route('/skills', methods=['GET'])
 def get_skills():
-    """Get all skills"""
-    skills = Skill.query.order_by(Skill.display_order).all()
-    return jsonify([skill.to_dict() for skill in skills])
+    """Get skills, one page at a time
+
+    Query parameters: limit, cursor, fields, category
+    """
+    try:
+        params = skills_params()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return cached_json(list_cache_key('skills', params), lambda: build_skills_json(params))
+
+
+def skills_params():
+    """Listing parameters of GET /api/skills (ValueError when invalid)"""
+    return {
+        'limit': parse_limit(),
+        'cursor': parse_cursor(),
+        'fields': parse_fields(SKILL_FIELDS),
+        'category': request.args.get('category') or None,
+    }
+
+
+def build_skills_json(params, session=None):
+    session = session or db.session
+    fields = params['fields'] or SKILL_FIELDS
+    query = projection(Skill, fields, extra=('id', 'display_order'))
+    if params['category']:
+        query = query.where(Skill.category == params['category'])
+
+    rows, next_cursor = keyset_page(session, query, Skill, params)
+    with timed('serialize'):
+        data = rows_to_dicts(rows, fields)
+    return page_payload(data, params, next_cursor)
 
 
 @route_api.route('/skills', methods=['POST'])
@@ -65,6 +262,9 @@ def get_skills():
 def create_skill():
     """Create a new skill"""
     data = request.json
+    message = display_order_error(Skill, data)
+    if message:
+        return jsonify({'message': message}), 400
     skill = Skill(
         name=data['name'],
         icon_class=data['icon_class'],
@@ -75,6 +275,7 @@ def create_skill():
     )
     db.session.add(skill)
     db.session.commit()
+    bump_content_version()
     return jsonify(skill.to_dict()), 201
 
 
@@ -84,6 +285,9 @@ def update_skill(skill_id):
     """Update a skill"""
     skill = Skill.query.get_or_404(skill_id)
     data = request.json
+    message = display_order_error(Skill, data)
+    if message:
+        return jsonify({'message': message}), 400
 
     skill.name = data.get('name', skill.name)
     skill.icon_class = data.get('icon_class', skill.icon_class)
@@ -93,6 +297,7 @@ def update_skill(skill_id):
     skill.is_active = data.get('is_active', skill.is_active)
 
     db.session.commit()
+    bump_content_version()
     return jsonify(skill.to_dict())
 
 
@@ -103,6 +308,7 @@ def delete_skill(skill_id):
     skill = Skill.query.get_or_404(skill_id)
     db.session.delete(skill)
     db.session.commit()
+    bump_content_version()
     return jsonify({'message': 'Skill deleted successfully'})
 
 
@@ -112,9 +318,56 @@ def delete_skill(skill_id):
 
 @route_api.route('/projects', methods=['GET'])
 def get_projects():
-    """Get all projects"""
-    projects = Project.query.order_by(Project.display_order).all()
-    return jsonify([project.to_dict() for project in projects])
+    """Get projects, one page at a time
+
+    Query parameters: limit, cursor, fields, tag and published
+    (true by default; false/all require authentication)
+    """
+    try:
+        params = projects_params()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    private = params['published'] != 'true'
+    if private and not current_user.is_authenticated:
+        return jsonify({'message': 'Authentication required to list unpublished projects'}), 403
+
+    return cached_json(list_cache_key('projects', params), lambda: build_projects_json(params), private=private)
+
+
+def projects_params():
+    """Listing parameters of GET /api/projects (ValueError when invalid)"""
+    params = {
+        'limit': parse_limit(),
+        'cursor': parse_cursor(),
+        'fields': parse_fields(PROJECT_FIELDS),
+        'published': request.args.get('published', 'true').lower(),
+        'tag': request.args.get('tag') or None,
+    }
+    if params['published'] not in ('true', 'false', 'all'):
+        raise ValueError("'published' must be true, false or all")
+    return params
+
+
+def build_projects_json(params, session=None):
+    session = session or db.session
+    fields = params['fields'] or PROJECT_FIELDS
+    columns = tuple(name for name in fields if name != 'tags')
+    query = projection(Project, columns, extra=('id', 'display_order'))
+    if params['published'] != 'all':
+        query = query.where(Project.is_published == (params['published'] == 'true'))
+    if params['tag']:
+        query = query.where(Project.tags.any(ProjectTag.name == params['tag']))
+
+    rows, next_cursor = keyset_page(session, query, Project, params)
+    tags = project_tags(session, [row.id for row in rows]) if 'tags' in fields else None
+    with timed('serialize'):
+        data = rows_to_dicts(rows, columns)
+        if tags is not None:
+            for item, row in zip(data, rows):
+                item['tags'] = tags[row.id]
+    # Deletions, unpublishing and tag changes move no updated_at of the listed rows
+    return page_payload(data, params, next_cursor, content_changed_at())
 
 
 @route_api.route('/projects', methods=['POST'])
@@ -122,6 +375,9 @@ def get_projects():
 def create_project():
     """Create a new project"""
     data = request.json
+    message = display_order_error(Project, data)
+    if message:
+        return jsonify({'message': message}), 400
     project = Project(
         title=data['title'],
         description=data['description'],
@@ -132,21 +388,10 @@ def create_project():
         animation_delay=data.get('animation_delay', '0s'),
         is_published=data.get('is_published', True)
     )
+    project.sync_tags(data.get('tags', []))
     db.session.add(project)
-    db.session.flush()
-
-    # Add tags
-    tags_data = data.get('tags', [])
-    for tag_data in tags_data:
-        tag = ProjectTag(
-            project_id=project.id,
-            name=tag_data['name'],
-            color_class=tag_data.get('color_class', 'bg-primary'),
-            display_order=tag_data.get('display_order', 0)
-        )
-        db.session.add(tag)
-
     db.session.commit()
+    bump_content_version()
     return jsonify(project.to_dict()), 201
 
 
@@ -156,6 +401,9 @@ def update_project(project_id):
     """Update a project"""
     project = Project.query.get_or_404(project_id)
     data = request.json
+    message = display_order_error(Project, data)
+    if message:
+        return jsonify({'message': message}), 400
 
     project.title = data.get('title', project.title)
     project.description = data.get('description', project.description)
@@ -166,21 +414,12 @@ def update_project(project_id):
     project.animation_delay = data.get('animation_delay', project.animation_delay)
     project.is_published = data.get('is_published', project.is_published)
 
-    # Update tags if provided
+    # Update tags if provided, writing only what changed
     if 'tags' in data:
-        # Remove old tags
-        ProjectTag.query.filter_by(project_id=project.id).delete()
-        # Add new tags
-        for tag_data in data['tags']:
-            tag = ProjectTag(
-                project_id=project.id,
-                name=tag_data['name'],
-                color_class=tag_data.get('color_class', 'bg-primary'),
-                display_order=tag_data.get('display_order', 0)
-            )
-            db.session.add(tag)
+        project.sync_tags(data['tags'])
 
     db.session.commit()
+    bump_content_version()
     return jsonify(project.to_dict())
 
 
@@ -191,6 +430,7 @@ def delete_project(project_id):
     project = Project.query.get_or_404(project_id)
     db.session.delete(project)
     db.session.commit()
+    bump_content_version()
     return jsonify({'message': 'Project deleted successfully'})
 
 
@@ -201,8 +441,14 @@ def delete_project(project_id):
 @route_api.route('/social-links', methods=['GET'])
 def get_social_links():
     """Get all social links"""
-    links = SocialLink.query.order_by(SocialLink.display_order).all()
-    return jsonify([link.to_dict() for link in links])
+    return cached_json('social-links', build_social_links_json)
+
+
+def build_social_links_json(session=None):
+    links = (session or db.session).query(SocialLink).order_by(SocialLink.display_order).all()
+    with timed('serialize'):
+        data = [link.to_dict() for link in links]
+    return dumps(data)
 
 
 @route_api.route('/social-links', methods=['POST'])
@@ -220,6 +466,7 @@ def create_social_link():
     )
     db.session.add(link)
     db.session.commit()
+    bump_content_version()
     return jsonify(link.to_dict()), 201
 
 
@@ -238,6 +485,7 @@ def update_social_link(link_id):
     link.is_active = data.get('is_active', link.is_active)
 
     db.session.commit()
+    bump_content_version()
     return jsonify(link.to_dict())
 
 
@@ -248,4 +496,199 @@ def delete_social_link(link_id):
     link = SocialLink.query.get_or_404(link_id)
     db.session.delete(link)
     db.session.commit()
+    bump_content_version()
     return jsonify({'message': 'Social link deleted successfully'})
+
+
+# ============================================================================
+# BATCH ENDPOINT
+# ============================================================================
+
+# type -> (model, fields required on create, optional fields with their defaults)
+BATCH_RESOURCES = {
+    'skill': (Skill, ('name', 'icon_class'),
+              {'category': None, 'proficiency_level': None, 'display_order': 0, 'is_active': True}),
+    'project': (Project, ('title', 'description'),
+                {'image_url': None, 'demo_url': None, 'github_url': None, 'display_order': 0,
+                 'animation_delay': '0s', 'is_published': True}),
+    'social_link': (SocialLink, ('platform_name', 'url', 'icon_class'),
+                    {'display_order': 0, 'animation_delay': '0s', 'is_active': True}),
+}
+
+
+TAG_FIELDS = ('name', 'color_class', 'display_order')
+
+
+def field_error(model, name, value):
+    """Why ``value`` cannot be stored in the ``name`` column of ``model``, or None
+
+    Columns with a default (display_order, is_active, ...) do not accept null either.
+    """
+    column = model.__table__.columns[name]
+    if value is None:
+        if column.nullable and column.default is None:
+            return None
+        return f"'{name}' cannot be null"
+    if isinstance(column.type, db.Boolean):
+        valid, expected = isinstance(value, bool), 'a boolean'
+    elif isinstance(column.type, db.Integer):
+        valid, expected = isinstance(value, int) and not isinstance(value, bool), 'an integer'
+    else:
+        valid, expected = isinstance(value, str), 'a string'
+        length = getattr(column.type, 'length', None)
+        if valid and length and len(value) > length:
+            return f"'{name}' must be at most {length} characters"
+    return None if valid else f"'{name}' must be {expected}"
+
+
+def tags_error(tags):
+    """Why a 'tags' list cannot be synced, or None"""
+    if not isinstance(tags, list) or not all(isinstance(tag, dict) and tag.get('name') for tag in tags):
+        return "'tags' must be a list of objects with a name"
+    for tag in tags:
+        unknown = set(tag) - set(TAG_FIELDS)
+        if unknown:
+            return f"Unknown tag fields: {', '.join(sorted(unknown))}"
+        for name, value in tag.items():
+            message = field_error(ProjectTag, name, value)
+            if message:
+                return f"Tag {message}"
+    return None
+
+
+def validate_operation(operation, existing, seen):
+    """Return why a batch operation cannot be applied, or None if it can"""
+    if not isinstance(operation, dict):
+        return 'Operation must be an object'
+    if operation.get('op') not in ('upsert', 'delete'):
+        return "'op' must be upsert or delete"
+    kind = operation.get('type')
+    if kind not in BATCH_RESOURCES:
+        return f"'type' must be one of: {', '.join(BATCH_RESOURCES)}"
+
+    item_id = operation.get('id')
+    if item_id is not None:
+        if not isinstance(item_id, int) or isinstance(item_id, bool):
+            return "'id' must be an integer"
+        if item_id not in existing[kind]:
+            return f"{kind} {item_id} not found"
+        if (kind, item_id) in seen:
+            return f"{kind} {item_id} appears more than once in the batch"
+        seen.add((kind, item_id))
+    elif operation['op'] == 'delete':
+        return "'id' is required to delete"
+
+    if operation['op'] == 'delete':
+        return None
+
+    data = operation.get('data')
+    if not isinstance(data, dict):
+        return "'data' must be an object"
+    _, required, optional = BATCH_RESOURCES[kind]
+    allowed = set(required) | set(optional) | ({'tags'} if kind == 'project' else set())
+    unknown = set(data) - allowed
+    if unknown:
+        return f"Unknown fields: {', '.join(sorted(unknown))}"
+    if item_id is None:
+        missing = [name for name in required if not data.get(name)]
+        if missing:
+            return f"Missing required fields: {', '.join(missing)}"
+    model = BATCH_RESOURCES[kind][0]
+    for name, value in data.items():
+        message = tags_error(value) if name == 'tags' else field_error(model, name, value)
+        if message:
+            return message
+    return None
+
+
+@route_api.route('/batch', methods=['POST'])
+@login_required
+def batch():
+    """Apply many upserts and deletes of skills, projects and social links at once
+
+    The body is a JSON array of operations:
+    {"op": "upsert" | "delete", "type": "skill" | "project" | "social_link",
+     "id": <omit to create>, "data": {...fields, "tags": [...] for projects}}
+    Every operation is applied in a single transaction, or none is.
+    """
+    operations = request.get_json(silent=True)
+    if not isinstance(operations, list):
+        return jsonify({'message': 'Expected a JSON array of operations'}), 400
+    if len(operations) > config.API_BATCH_MAX_ITEMS:
+        return jsonify({'message': f'At most {config.API_BATCH_MAX_ITEMS} operations per batch'}), 400
+
+    # Load every referenced row with one query per resource type
+    wanted = {kind: set() for kind in BATCH_RESOURCES}
+    for operation in operations:
+        if isinstance(operation, dict) and operation.get('type') in BATCH_RESOURCES \
+                and isinstance(operation.get('id'), int):
+            wanted[operation['type']].add(operation['id'])
+    existing = {}
+    for kind, ids in wanted.items():
+        model = BATCH_RESOURCES[kind][0]
+        query = model.query.filter(model.id.in_(ids))
+        if kind == 'project':
+            query = query.options(selectinload(Project.tags))
+        existing[kind] = {item.id: item for item in query} if ids else {}
+
+    seen = set()
+    errors = []
+    for index, operation in enumerate(operations):
+        message = validate_operation(operation, existing, seen)
+        if message:
+            errors.append({'index': index, 'status': 'error', 'message': message})
+    if errors:
+        return jsonify({'message': 'No operation was applied', 'results': errors}), 400
+
+    results = []
+    created = []
+    deleted = {kind: [] for kind in BATCH_RESOURCES}
+    for index, operation in enumerate(operations):
+        kind = operation['type']
+        model, required, optional = BATCH_RESOURCES[kind]
+        data = operation.get('data') or {}
+
+        if operation['op'] == 'delete':
+            deleted[kind].append(operation['id'])
+            results.append({'index': index, 'type': kind, 'id': operation['id'], 'status': 'deleted'})
+            continue
+
+        if operation.get('id') is None:
+            item = model(**{name: data[name] for name in required},
+                         **{name: data.get(name, default) for name, default in optional.items()})
+            created.append((index, item))
+            status = 'created'
+        else:
+            item = existing[kind][operation['id']]
+            for name in (*required, *optional):
+                if name in data:
+                    setattr(item, name, data[name])
+            status = 'updated'
+        if 'tags' in data:
+            item.sync_tags(data['tags'])
+        results.append({'index': index, 'type': kind, 'id': item.id, 'status': status})
+
+    try:
+        # New rows are flushed together, so the ORM batches their INSERTs
+        db.session.add_all(item for _, item in created)
+        if deleted['project']:
+            ProjectTag.query.filter(ProjectTag.project_id.in_(deleted['project'])).delete()
+            if any(existing['project'][item_id].is_published for item_id in deleted['project']):
+                ContentRemoval.record(db.session)  # Bulk deletes skip the flush hook
+        for kind, ids in deleted.items():
+            if ids:
+                model = BATCH_RESOURCES[kind][0]
+                model.query.filter(model.id.in_(ids)).delete()
+        db.session.flush()
+        for index, item in created:
+            results[index]['id'] = item.id
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        # The database error may reveal the schema: it goes to the log, not to the client
+        current_app.logger.exception("Batch rejected by the database")
+        return jsonify({'message': 'No operation was applied', 'error': 'The batch could not be saved'}), 400
+
+    # One invalidation for the whole batch
+    bump_content_version()
+    return jsonify({'results': results})
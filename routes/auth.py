@@ -11,6 +11,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, current_user, login_required
 from models import User, db
 from datetime import datetime
+import login_guard
 
 route_auth = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -31,14 +32,28 @@ def login():
             flash('Per favore inserisci username e password.', 'danger')
             return render_template('auth/login.html')
 
+        # Troppi tentativi falliti da questo IP o per questo utente: rifiuta prima di calcolare bcrypt
+        client_ip = request.remote_addr or 'unknown'
+        wait = login_guard.retry_after(client_ip, username)
+        if wait:
+            flash(f'Troppi tentativi di accesso. Riprova tra {wait} secondi.', 'danger')
+            return render_template('auth/login.html'), 429, {'Retry-After': str(wait)}
+
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and login_guard.verify_password(user, password)
+        except login_guard.LoginBusy:
+            flash('Server occupato, riprova tra qualche secondo.', 'warning')
+            return render_template('auth/login.html'), 503, {'Retry-After': '1'}
+
+        if valid:
             if not user.is_active:
                 flash('Il tuo account è stato disabilitato.', 'danger')
                 return render_template('auth/login.html')
+            login_guard.record_success(username)
 
-            # Aggiorna last_login
+            # Aggiorna last_login (e l'hash della password se è stato aggiornato il costo)
             user.last_login = datetime.utcnow()
             db.session.commit()
 
@@ -49,6 +64,7 @@ def login():
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('admin.dashboard'))
         else:
+            login_guard.record_failure(client_ip, username)
             flash('Username o password non corretti.', 'danger')
 
     return render_template('auth/login.html')
@@ -76,8 +92,16 @@ def change_password():
             flash('Tutti i campi sono obbligatori.', 'danger')
             return render_template('auth/change_password.html')
 
+        # current_user is a cached read-only copy: work on the database row
+        user = db.session.get(User, current_user.id)
+
         # Check current password
-        if not current_user.check_password(current_password):
+        try:
+            valid = login_guard.verify_password(user, current_password)
+        except login_guard.LoginBusy:
+            flash('Server occupato, riprova tra qualche secondo.', 'warning')
+            return render_template('auth/change_password.html'), 503, {'Retry-After': '1'}
+        if not valid:
             flash('La password attuale non è corretta.', 'danger')
             return render_template('auth/change_password.html')
 
@@ -92,7 +116,7 @@ def change_password():
             return render_template('auth/change_password.html')
 
         # Update password
-        current_user.set_password(new_password)
+        user.set_password(new_password)
         db.session.commit()
 
         flash('Password modificata con successo!', 'success')
@@ -3,24 +3,36 @@
 
 # Copyright Hersel Giannella
 
-from flask import Blueprint, render_template
-from models import Profile, Skill, Project, SocialLink
+from flask import Blueprint, current_app, render_template
+from db_routing import prefer_replica
+from cache import get_snapshot, get_cached_body, cached_response
+from images import variants_generation
 
 route_home = Blueprint('route_home', __name__)
+route_home.before_request(prefer_replica)  # Public reads may use a read replica
 
 @route_home.route('/')
 def home():
     """Render home page with dynamic data from database"""
-    # Fetch all data from database
-    profile = Profile.query.first()
-    skills = Skill.query.filter_by(is_active=True).order_by(Skill.display_order).all()
-    projects = Project.query.filter_by(is_published=True).order_by(Project.display_order).all()
-    social_links = SocialLink.query.filter_by(is_active=True).order_by(SocialLink.display_order).all()
+    # The rendered page is cached per content version, so a repeat visitor
+    # gets a 304 and everyone else gets precompressed bytes without rendering
+    page = get_cached_body(home_cache_key(), render_home)
+    return cached_response(page)
+
+
+def home_cache_key():
+    """The page embeds the image manifests, which are published after the content changed"""
+    return f"home:{variants_generation(current_app.config['UPLOAD_FOLDER'])}"
+
+
+def render_home(snapshot=None):
+    """Render index.html from the per-worker content snapshot"""
+    snapshot = snapshot or get_snapshot()
 
     return render_template(
         'index.html',
-        profile=profile,
-        skills=skills,
-        projects=projects,
-        social_links=social_links
-    )
+        profile=snapshot.profile,
+        skills=snapshot.skills,
+        projects=snapshot.projects,
+        social_links=snapshot.social_links
+    ).encode('utf-8')
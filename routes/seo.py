@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+sitemap.xml and robots.txt generated from the portfolio content
+Both are cached and precompressed like the home page and rebuilt only when the
+content version changes, so frequent crawler hits are answered from memory or with a 304
+"""
+
+from datetime import timezone
+
+from flask import Blueprint, render_template, url_for
+from sqlalchemy import func, select
+from config import config
+from db_routing import prefer_replica
+from cache import Payload, get_cached_body, cached_response
+from models import db, Profile, Project, ContentRemoval
+
+route_seo = Blueprint('seo', __name__)
+route_seo.before_request(prefer_replica)  # Public reads may use a read replica
+
+
+@route_seo.route('/sitemap.xml')
+def sitemap():
+    """Sitemap with lastmod taken from the profile and the published projects"""
+    return cached_response(get_cached_body('sitemap.xml', build_sitemap, mimetype='application/xml'))
+
+
+@route_seo.route('/robots.txt')
+def robots():
+    return cached_response(get_cached_body('robots.txt', build_robots, mimetype='text/plain'))
+
+
+def absolute_url(endpoint, **values):
+    return config.SITE_URL.rstrip('/') + url_for(endpoint, **values)
+
+
+def content_last_modified(session=None):
+    """Most recent change of the content shown on the home page (one query)
+
+    The updated_at of the profile and of the published projects, or the last deletion or
+    unpublishing of a project. Stored in the database, so restarts and deploys keep it.
+    """
+    profile = select(func.max(Profile.updated_at)).scalar_subquery()
+    projects = select(func.max(Project.updated_at)).where(Project.is_published.is_(True)).scalar_subquery()
+    removed = select(func.max(ContentRemoval.removed_at)).scalar_subquery()
+    dates = (session or db.session).execute(select(profile, projects, removed)).one()
+    return max((date for date in dates if date is not None), default=None)
+
+
+def build_sitemap(session=None):
+    last_modified = content_last_modified(session)
+    lastmod = None
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0)
+        lastmod = last_modified.replace(tzinfo=timezone.utc).isoformat()
+
+    # The portfolio is a single page; per-project pages would be listed here too
+    urls = [{'loc': absolute_url('route_home.home'), 'lastmod': lastmod}]
+    body = render_template('seo/sitemap.xml', urls=urls).encode('utf-8')
+    return Payload(body, last_modified)
+
+
+def build_robots():
+    return render_template('seo/robots.txt', site_url=config.SITE_URL.rstrip('/')).encode('utf-8')
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Application server settings computed from config.Config
+Worker and thread counts follow the CPUs available to the process, and keep-alive,
+listen backlog, worker recycling and graceful shutdown come from the SERVER_* settings.
+The same values are exposed to both servers:
+
+    hypercorn -c python:server_config.hypercorn asgi:app
+    gunicorn app:app  (reads gunicorn.conf.py)
+
+The production profile refuses to start with DEBUG or SERVER_RELOAD enabled, or with
+several workers on the process-local cache backend.
+"""
+
+import logging
+import os
+from types import SimpleNamespace
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ServerConfigError(RuntimeError):
+    """Raised when the settings are not allowed in the selected profile"""
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on (the container's CPU set, not the host's)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+def check_profile(cfg=config, workers=1):
+    """Refuse the debugger, the file-watching reloader and an unshared cache in production
+
+    With CACHE_BACKEND=local every worker keeps its own content version, so an edit would
+    only invalidate the worker that received it; outside production this is only a warning.
+    """
+    if workers > 1 and cfg.CACHE_BACKEND == 'local':
+        message = (f"{workers} workers with CACHE_BACKEND=local would serve stale content after an edit "
+                   f"(use CACHE_BACKEND=file or redis, or SERVER_WORKERS=1)")
+        if cfg.SERVER_PROFILE == 'production':
+            raise ServerConfigError(message)
+        logger.warning(message)
+    if cfg.SERVER_PROFILE != 'production':
+        return
+    enabled = [name for name in ('DEBUG', 'SERVER_RELOAD') if getattr(cfg, name)]
+    if enabled:
+        raise ServerConfigError(f"{' and '.join(enabled)} must be disabled with SERVER_PROFILE=production "
+                                f"(use SERVER_PROFILE=development locally)")
+
+
+def server_workers(server, cfg=config) -> int:
+    """Worker processes: SERVER_WORKERS, or computed from the CPU count"""
+    if cfg.SERVER_WORKERS:
+        return cfg.SERVER_WORKERS
+    if cfg.SERVER_PROFILE == 'development':
+        return 1
+    if server == 'hypercorn':
+        return cpu_count()  # One event loop per CPU
+    return 2 * cpu_count() + 1  # Threaded workers spend most of their time waiting on the database
+
+
+def server_threads(cfg=config) -> int:
+    """Request threads per gunicorn worker: SERVER_THREADS, or one per pooled connection"""
+    if cfg.SERVER_THREADS:
+        return cfg.SERVER_THREADS
+    # More threads than connections would only queue on the pool (DB_POOL_TIMEOUT)
+    return cfg.DB_POOL_SIZE + cfg.DB_MAX_OVERFLOW
+
+
+def _recycling(cfg):
+    """max_requests and its jitter, so that workers do not all restart at the same moment"""
+    if cfg.SERVER_PROFILE == 'development' or not cfg.SERVER_MAX_REQUESTS:
+        return 0, 0
+    jitter = cfg.SERVER_MAX_REQUESTS_JITTER
+    if jitter is None:
+        jitter = cfg.SERVER_MAX_REQUESTS // 10
+    return cfg.SERVER_MAX_REQUESTS, jitter
+
+
+def server_settings(server, cfg=config) -> dict:
+    """Settings for ``server`` ('gunicorn' or 'hypercorn') in their own option names"""
+    workers = server_workers(server, cfg)
+    check_profile(cfg, workers)
+    bind = f"{cfg.APP_HOST}:{cfg.APP_PORT}"
+    max_requests, jitter = _recycling(cfg)
+
+    if server == 'hypercorn':
+        return {
+            'bind': [bind],
+            'workers': workers,
+            'backlog': cfg.SERVER_BACKLOG,
+            'keep_alive_timeout': cfg.SERVER_KEEPALIVE,
+            'graceful_timeout': cfg.SERVER_GRACEFUL_TIMEOUT,
+            'max_requests': max_requests or None,
+            'max_requests_jitter': jitter,
+            'use_reloader': cfg.SERVER_RELOAD,
+            'debug': cfg.DEBUG,
+            'accesslog': '-' if cfg.SERVER_ACCESS_LOG else None,
+        }
+
+    if server == 'gunicorn':
+        threads = server_threads(cfg)
+        pool = cfg.DB_POOL_SIZE + cfg.DB_MAX_OVERFLOW
+        if threads > pool:
+            logger.warning("%d threads per worker share %d database connections: requests will wait "
+                           "for the pool", threads, pool)
+        return {
+            'bind': bind,
+            'workers': workers,
+            'threads': threads,
+            'worker_class': 'gthread' if threads > 1 else 'sync',
+            'backlog': cfg.SERVER_BACKLOG,
+            'keepalive': cfg.SERVER_KEEPALIVE,
+            'timeout': cfg.SERVER_TIMEOUT,
+            'graceful_timeout': cfg.SERVER_GRACEFUL_TIMEOUT,
+            'max_requests': max_requests,
+            'max_requests_jitter': jitter,
+            'reload': cfg.SERVER_RELOAD,
+            'accesslog': '-' if cfg.SERVER_ACCESS_LOG else None,
+        }
+
+    raise ValueError(f"Unknown server: {server}")
+
+
+def __getattr__(name):
+    # Computed on access, so importing this module never fails the profile check:
+    # hypercorn -c python:server_config.hypercorn
+    if name == 'hypercorn':
+        return SimpleNamespace(**server_settings('hypercorn'))
+    raise AttributeError(name)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import os
+import sys
+
+import pytest
+
+# Run the in-process tests against an in-memory SQLite database
+os.environ['DB_ENGINE'] = 'sqlite'
+os.environ['DB_SQLITE_PATH'] = ''
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'  # Fast hashing in tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app as flask_app  # noqa: E402
+from init_db import init_database  # noqa: E402
+from cache import bump_content_version, invalidate_user  # noqa: E402
+import login_guard  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """Applicazione Flask con database SQLite popolato dai dati di init_db.py"""
+    flask_app.testing = True
+    init_database(reset=True)
+    bump_content_version()
+    invalidate_user()
+    login_guard.reset()
+    yield flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_client(client):
+    """Client autenticato con l'utente admin creato da init_db.py"""
+    response = client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+
+def test_api_get_served_from_cache(client):
+    """Le GET pubbliche vengono servite dalla cache JSON e rivalidate con l'ETag"""
+    first = client.get('/api/projects')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'].startswith('public')
+
+    second = client.get('/api/projects')
+    assert second.headers['X-Query-Count'] == '0'
+    assert second.get_data() == first.get_data()
+
+    response = client.get('/api/projects', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+
+
+def test_api_profile_last_modified(client):
+    """Il profilo espone Last-Modified da Profile.updated_at"""
+    response = client.get('/api/profile')
+    assert response.last_modified is not None
+
+    response = client.get('/api/profile', headers={'If-Modified-Since': response.headers['Last-Modified']})
+    assert response.status_code == 304
+
+
+def test_api_projects_last_modified_follows_content_version(auth_client):
+    """Last-Modified della lista progetti avanza anche con modifiche ai soli tag e con le eliminazioni"""
+    def modified_since(response):
+        return auth_client.get('/api/projects', headers={'If-Modified-Since': response.headers['Last-Modified']})
+
+    first = auth_client.get('/api/projects')
+    assert modified_since(first).status_code == 304
+
+    project = first.get_json()[0]
+    response = auth_client.put(f"/api/projects/{project['id']}", json={'tags': [{'name': 'Solo tag'}]})
+    assert response.status_code == 200
+    after_tags = modified_since(first)
+    assert after_tags.status_code == 200
+
+    assert auth_client.delete(f"/api/projects/{project['id']}").status_code == 200
+    after_delete = modified_since(after_tags)
+    assert after_delete.status_code == 200
+    assert project['id'] not in [item['id'] for item in after_delete.get_json()]
+
+
+def test_api_write_invalidates_cache(auth_client):
+    """Una scrittura tramite API invalida la risposta in cache"""
+    before = auth_client.get('/api/profile')
+
+    response = auth_client.put('/api/profile', json={'title': 'Nuovo titolo'})
+    assert response.status_code == 200
+
+    after = auth_client.get('/api/profile', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.get_json()['title'] == 'Nuovo titolo'
+
+
+def test_api_projects_keyset_pagination(client):
+    """La paginazione a cursore restituisce tutti i progetti pubblicati, una pagina alla volta"""
+    titles = []
+    url = '/api/projects?limit=2'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 2
+        titles += [project['title'] for project in page]
+        link = response.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+
+    assert titles == [project['title'] for project in client.get('/api/projects').get_json()]
+    assert len(titles) == 3
+
+
+def test_api_display_order_cannot_be_null(auth_client):
+    """display_order è la chiave della paginazione: null viene rifiutato e nessun elemento sparisce"""
+    for url in ('/api/projects/2', '/api/skills/2'):
+        response = auth_client.put(url, json={'display_order': None})
+        assert response.status_code == 400
+        assert 'display_order' in response.get_json()['message']
+    assert auth_client.post('/api/skills', json={'name': 'Go', 'icon_class': 'fab fa-golang',
+                                                 'display_order': 'first'}).status_code == 400
+
+    ids = []
+    url = '/api/skills?limit=3'
+    while url:
+        response = auth_client.get(url)
+        assert response.status_code == 200
+        ids += [skill['id'] for skill in response.get_json()]
+        link = response.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+    assert len(ids) == 8 and len(set(ids)) == 8
+
+
+def test_api_projects_fields_and_filters(client):
+    """fields= limita i campi restituiti, tag= e category= filtrano in SQL"""
+    projects = client.get('/api/projects?fields=title,id&tag=Redis').get_json()
+    assert projects == [{'id': 3, 'title': 'Nextcloud Personale'}]
+
+    skills = client.get('/api/skills?category=OS&fields=name').get_json()
+    assert skills == [{'name': 'Linux'}, {'name': 'Windows'}]
+
+
+def test_api_projects_rejects_invalid_parameters(client):
+    """Parametri non validi restituiscono 400, i progetti non pubblicati richiedono il login"""
+    assert client.get('/api/projects?fields=password').status_code == 400
+    assert client.get('/api/projects?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/skills?limit=0').status_code == 400
+    assert client.get('/api/projects?published=all').status_code == 403
+
+
+def test_api_projects_unpublished_for_admin(auth_client):
+    """Un utente autenticato può elencare anche i progetti non pubblicati"""
+    auth_client.put('/api/projects/1', json={'is_published': False})
+
+    response = auth_client.get('/api/projects?published=false')
+    assert response.headers['Cache-Control'].startswith('private')
+    assert [project['id'] for project in response.get_json()] == [1]
+
+
+def test_api_batch_applies_all_operations(auth_client):
+    """Il batch applica upsert e delete in un'unica transazione"""
+    response = auth_client.post('/api/batch', json=[
+        {'op': 'upsert', 'type': 'skill', 'data': {'name': 'Rust', 'icon_class': 'fab fa-rust'}},
+        {'op': 'upsert', 'type': 'project', 'data': {
+            'title': 'Batch', 'description': 'Creato in batch', 'tags': [{'name': 'API'}]}},
+        {'op': 'upsert', 'type': 'social_link', 'id': 1, 'data': {'platform_name': 'LinkedIn Pro'}},
+        {'op': 'delete', 'type': 'project', 'id': 1},
+    ])
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['created', 'created', 'updated', 'deleted']
+
+    projects = auth_client.get('/api/projects').get_json()
+    assert 1 not in [project['id'] for project in projects]
+    assert next(p for p in projects if p['id'] == results[1]['id'])['tags'][0]['name'] == 'API'
+    assert auth_client.get('/api/social-links').get_json()[0]['platform_name'] == 'LinkedIn Pro'
+
+
+def test_api_batch_is_all_or_nothing(auth_client):
+    """Se un'operazione non è valida nessuna viene applicata"""
+    before = auth_client.get('/api/skills').get_json()
+    response = auth_client.post('/api/batch', json=[
+        {'op': 'upsert', 'type': 'skill', 'data': {'name': 'Go', 'icon_class': 'fab fa-golang'}},
+        {'op': 'delete', 'type': 'skill', 'id': 999},
+    ])
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['index'] == 1
+    assert auth_client.get('/api/skills').get_json() == before
+
+
+def test_api_batch_validates_field_types(auth_client):
+    """I tipi dei campi vengono verificati prima di arrivare al database"""
+    invalid = [
+        {'op': 'upsert', 'type': 'skill', 'id': 1, 'data': {'display_order': 'abc'}},
+        {'op': 'upsert', 'type': 'skill', 'id': 2, 'data': {'display_order': None}},
+        {'op': 'upsert', 'type': 'project', 'id': 1, 'data': {'is_published': 'yes'}},
+        {'op': 'upsert', 'type': 'project', 'id': 2, 'data': {'tags': [{'name': 'x' * 51}]}},
+        {'op': 'upsert', 'type': 'social_link', 'id': 1, 'data': {'url': 42}},
+    ]
+    response = auth_client.post('/api/batch', json=invalid)
+    assert response.status_code == 400
+    messages = [result['message'] for result in response.get_json()['results']]
+    assert messages == ["'display_order' must be an integer", "'display_order' cannot be null",
+                        "'is_published' must be a boolean", "Tag 'name' must be at most 50 characters",
+                        "'url' must be a string"]
+
+    response = auth_client.post('/api/batch', json=[
+        {'op': 'upsert', 'type': 'skill', 'id': 1, 'data': {'category': None, 'proficiency_level': 4}}])
+    assert response.status_code == 200
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('hypercorn')
+
+from flask import g  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+import asgi  # noqa: E402
+from cache import bump_content_version  # noqa: E402
+from config import config  # noqa: E402
+from models import db  # noqa: E402
+
+
+async def call(path, method='GET', query=b'', headers=()):
+    """Esegue una richiesta sull'applicazione ASGI e restituisce stato, header e corpo"""
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query,
+             'root_path': '', 'headers': [(k.lower().encode(), v.encode()) for k, v in headers],
+             'client': ('127.0.0.1', 1234), 'server': ('localhost', 80)}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.app(scope, receive, send)
+    headers = {k.decode(): v.decode() for k, v in messages[0]['headers']}
+    return messages[0]['status'], headers, b''.join(m.get('body', b'') for m in messages[1:])
+
+
+@pytest.fixture
+def async_db(app, tmp_path, monkeypatch):
+    """Copia su file del database di test, letta dal motore asincrono"""
+    path = tmp_path / 'portfolio.db'
+    with app.app_context():
+        source = db.engine.raw_connection()
+        target = sqlite3.connect(path)
+        source.driver_connection.backup(target)
+        target.close()
+        source.close()
+    monkeypatch.setattr(config, 'ASGI_ASYNC_ROUTES', True)
+    engine = asgi.configure(create_async_engine(f"sqlite+aiosqlite:///{path}"))
+    yield
+    asyncio.run(engine.dispose())
+    monkeypatch.setattr(asgi, '_session_factory', None)
+
+
+def test_async_routes_match_wsgi(app, client, async_db):
+    """Home e API pubbliche servite dai gestori asincroni coincidono con la versione WSGI"""
+    expected = {path: client.get(path).data for path in ('/', '/api/projects', '/api/skills', '/sitemap.xml')}
+
+    async def run():
+        bump_content_version()  # Forza la lettura dal database asincrono
+        results = {path: await call(path) for path in expected}
+        status, headers, body = await call('/api/skills', query=b'limit=2&fields=name')
+        assert status == 200 and len(json.loads(body)) == 2 and 'rel="next"' in headers['link']
+
+        etag = results['/api/projects'][1]['etag']
+        status, _, body = await call('/api/projects', headers=[('If-None-Match', etag)])
+        assert status == 304 and body == b''
+        return results
+
+    for path, (status, headers, body) in asyncio.run(run()).items():
+        assert status == 200 and body == expected[path], path
+
+
+def test_before_request_hooks_run(app, async_db):
+    """Gli hook before_request dei blueprint girano anche per i gestori asincroni"""
+    calls = []
+
+    def maintenance():
+        calls.append(g.get('request_start') is not None)  # App hook (start_request) ran first
+        if len(calls) > 1:
+            return 'Manutenzione', 503
+
+    hooks = app.before_request_funcs.setdefault('seo', [])
+    hooks.append(maintenance)
+    try:
+        assert asyncio.run(call('/robots.txt'))[0] == 200
+        status, _, body = asyncio.run(call('/robots.txt'))
+        assert status == 503 and body == b'Manutenzione'
+        assert calls == [True, True]
+    finally:
+        hooks.remove(maintenance)
+
+
+def test_other_requests_go_to_flask(app, async_db):
+    """Errori di validazione, progetti non pubblicati e scritture passano all'app WSGI"""
+    async def run():
+        return (await call('/api/projects', query=b'published=all'),
+                await call('/api/skills', query=b'limit=zero'),
+                await call('/api/skills', method='POST'),
+                await call('/admin/'))
+
+    private, invalid, write, admin = asyncio.run(run())
+    assert private[0] == 403
+    assert invalid[0] == 400 and b'limit' in invalid[2]
+    assert write[0] == 401 or write[0] == 302
+    assert admin[0] == 302
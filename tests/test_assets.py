@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import gzip
+
+from flask import url_for
+
+
+def test_static_urls_are_fingerprinted(app):
+    """url_for('static') aggiunge l'hash del contenuto"""
+    with app.test_request_context():
+        url = url_for('static', filename='css/styles.css')
+    assert '?v=' in url
+
+
+def test_fingerprinted_asset_is_immutable_and_precompressed(app, client):
+    """Gli URL con hash sono immutabili e serviti con il corpo precompresso"""
+    with app.test_request_context():
+        url = url_for('static', filename='css/styles.css')
+    with open(app.static_folder + '/css/styles.css', 'rb') as f:
+        original = f.read()
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == original
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+
+def test_unversioned_asset_revalidates(client):
+    """Senza hash (o con un hash vecchio) il file va rivalidato"""
+    response = client.get('/static/css/styles.css?v=vecchio')
+    assert response.status_code == 200
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert client.get('/static/../app.py').status_code == 404
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+from sqlalchemy import event
+
+import login_guard
+from config import config
+from models import db, User
+
+
+def login(client, password, username='admin', ip='10.0.0.1'):
+    return client.post('/auth/login', data={'username': username, 'password': password},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def test_failed_logins_are_throttled_before_hashing(client, monkeypatch):
+    """Dopo troppi tentativi falliti la richiesta è rifiutata senza calcolare bcrypt"""
+    for _ in range(config.LOGIN_MAX_FAILURES_PER_USER):
+        assert login(client, 'sbagliata').status_code == 200
+
+    checks = []
+    monkeypatch.setattr(User, 'check_password', lambda self, password: checks.append(password))
+    response = login(client, 'admin123', ip='10.0.0.2')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert checks == []
+
+
+def test_ip_limit_applies_across_usernames(client):
+    """Il limite per IP vale anche cambiando username"""
+    for i in range(config.LOGIN_MAX_FAILURES_PER_IP):
+        login(client, 'sbagliata', username=f'utente{i}')
+    assert login(client, 'admin123').status_code == 429
+    assert login(client, 'admin123', ip='10.0.0.3').status_code == 302
+
+
+def test_login_upgrades_hash_cost(app, client, monkeypatch):
+    """Al login l'hash viene ricalcolato se BCRYPT_LOG_ROUNDS è aumentato"""
+    monkeypatch.setattr(config, 'BCRYPT_LOG_ROUNDS', config.BCRYPT_LOG_ROUNDS + 1)
+    assert login(client, 'admin123').status_code == 302
+
+    with app.app_context():
+        user = User.query.filter_by(username='admin').first()
+        assert user.password_hash.split('$')[2] == f"{config.BCRYPT_LOG_ROUNDS:02d}"
+        assert not user.password_needs_rehash()
+        assert user.check_password('admin123')
+
+
+def test_login_busy_when_hash_queue_is_full(client, monkeypatch):
+    """Con troppe verifiche in corso il login risponde 503 invece di accodarsi"""
+    monkeypatch.setattr(login_guard, '_slots', login_guard.threading.BoundedSemaphore(1))
+    login_guard._slots.acquire()
+    response = login(client, 'admin123')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_login_busy_when_hash_is_too_slow(client, monkeypatch):
+    """Se la verifica non termina entro LOGIN_HASH_TIMEOUT il login risponde 503"""
+    release = login_guard.threading.Event()
+    monkeypatch.setattr(login_guard, '_check_and_rehash', lambda *args: release.wait(5) and (True, None))
+    monkeypatch.setattr(config, 'LOGIN_HASH_TIMEOUT', 0.05)
+    try:
+        assert login(client, 'admin123').status_code == 503
+    finally:
+        release.set()
+
+
+def test_rate_limiter_memory_is_bounded(monkeypatch):
+    """Con molti IP diversi vengono dimenticati i meno recenti, anche se non ancora scaduti"""
+    monkeypatch.setattr(login_guard, 'MAX_TRACKED_KEYS', 3)
+    limiter = login_guard.RateLimiter(limit=1, window=900)
+    for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.1', '10.0.0.4'):
+        limiter.hit(ip)
+    assert len(limiter._attempts) == 3
+    assert limiter.retry_after('10.0.0.1') and not limiter.retry_after('10.0.0.2')
+
+
+def user_queries(app, client, url):
+    """SQL statements on the users table executed while serving ``url``"""
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        if 'users' in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def test_logged_in_user_is_cached(app, auth_client):
+    """Le pagine admin successive non rileggono l'utente dal database"""
+    auth_client.get('/admin/')
+    assert user_queries(app, auth_client, '/admin/') == []
+
+
+def test_disabled_user_is_logged_out(app, auth_client):
+    """Disattivare l'utente invalida subito la cache e la sessione"""
+    auth_client.get('/admin/')
+    with app.app_context():
+        User.query.filter_by(username='admin').first().is_active = False
+        db.session.commit()
+
+    response = auth_client.get('/admin/')
+    assert response.status_code == 302
+    assert '/auth/login' in response.headers['Location']
+
+
+def test_change_password_updates_cached_user(auth_client, client):
+    """Il cambio password usa la riga del database e il nuovo hash vale al login successivo"""
+    response = auth_client.post('/auth/change-password', data={
+        'current_password': 'admin123', 'new_password': 'nuova-password',
+        'confirm_password': 'nuova-password'})
+    assert response.status_code == 302
+    auth_client.get('/auth/logout')
+    assert login(client, 'admin123').status_code == 200
+    assert login(client, 'nuova-password').status_code == 302
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import json
+
+import benchmark
+from models import Project, Skill
+
+
+def test_benchmark_reports_latency_percentiles(app):
+    """Il benchmark popola il database e misura throughput e percentili di ogni scenario"""
+    benchmark.seed(app, projects=10, tags_per_project=2, skills=5)
+    with app.app_context():
+        assert Project.query.count() == 13 and Skill.query.count() == 13
+
+    scenarios = [s for s in benchmark.SCENARIOS if s.name in ('home', 'api projects', 'admin update skill')]
+    results = benchmark.run(benchmark.InProcessTarget(app), requests=20, concurrency=1, scenarios=scenarios)
+
+    assert set(results) == {'home', 'api projects', 'admin update skill'}
+    for summary in results.values():
+        assert summary['requests'] == 20 and summary['errors'] == 0
+        assert 0 < summary['p50_ms'] <= summary['p95_ms'] <= summary['p99_ms'] <= summary['max_ms']
+    json.dumps(results)
+
+
+def test_compare_flags_regressions():
+    """Il confronto con una baseline segnala latenze, throughput ed errori peggiorati"""
+    baseline = {'results': {'home': {'p95_ms': 1.0, 'throughput_rps': 1000.0, 'errors': 0}}}
+    assert benchmark.compare({'home': {'p95_ms': 1.1, 'throughput_rps': 950.0, 'errors': 0}}, baseline) == []
+
+    regressions = benchmark.compare({'home': {'p95_ms': 2.0, 'throughput_rps': 500.0, 'errors': 3}}, baseline)
+    assert len(regressions) == 3
+    assert benchmark.percentile([1, 2, 3, 4], 50) == 2 and benchmark.percentile([1, 2, 3, 4], 99) == 4
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_cached_body, bump_content_version
+
+
+def test_concurrent_misses_build_once(app):
+    """Più richieste concorrenti sulla stessa chiave vuota eseguono una sola costruzione"""
+    builds = []
+    started = threading.Barrier(8)
+
+    def build():
+        builds.append(1)
+        return b'pagina'
+
+    def request(_):
+        started.wait()
+        with app.test_request_context('/'):
+            return get_cached_body('single-flight', build).body
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        bodies = list(executor.map(request, range(8)))
+    assert bodies == [b'pagina'] * 8 and len(builds) == 1
+
+
+def test_stale_body_served_while_rebuilding(app):
+    """Durante la ricostruzione le altre richieste ricevono subito la versione precedente"""
+    with app.test_request_context('/'):
+        get_cached_body('swr', lambda: b'v1')
+    bump_content_version()
+
+    building = threading.Event()
+    release = threading.Event()
+
+    def slow_build():
+        building.set()
+        release.wait(5)
+        return b'v2'
+
+    def rebuild():
+        with app.test_request_context('/'):
+            return get_cached_body('swr', slow_build).body
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(rebuild)
+        assert building.wait(5)
+        with app.test_request_context('/'):
+            assert get_cached_body('swr', lambda: b'unexpected').body == b'v1'
+        release.set()
+        assert leader.result() == b'v2'
+
+    with app.test_request_context('/'):
+        assert get_cached_body('swr', lambda: b'unexpected').body == b'v2'
+
+
+def test_stale_body_served_when_rebuild_fails(app):
+    """Se la ricostruzione fallisce viene servita l'ultima versione valida"""
+    def failing_build():
+        raise RuntimeError("database non raggiungibile")
+
+    with app.test_request_context('/'):
+        get_cached_body('stale-if-error', lambda: b'v1')
+        bump_content_version()
+        assert get_cached_body('stale-if-error', failing_build).body == b'v1'
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import os
+import threading
+import time
+
+import pytest
+
+import cache
+from cache_backends import CacheBackendError, FileBackend, RedisBackend
+
+
+@pytest.fixture
+def use_backend(app):
+    """Installa un backend condiviso e ripristina quello locale alla fine del test"""
+    installed = []
+
+    def install(backend):
+        installed.append(cache.set_backend(backend))
+        return backend
+
+    yield install
+    if installed:
+        cache.set_backend(installed[0])
+
+
+def query_count(client, url):
+    return int(client.get(url).headers['X-Query-Count'])
+
+
+def test_file_backend_shares_version_and_bodies(client, tmp_path, use_backend):
+    """Con il backend file una scrittura in un worker invalida tutti gli altri e le risposte sono condivise"""
+    worker = use_backend(FileBackend(str(tmp_path), 'release'))
+    other_worker = FileBackend(str(tmp_path), 'release')
+
+    assert query_count(client, '/api/projects') > 0
+    cache.clear_local()  # Come un altro worker appena avviato
+    assert query_count(client, '/api/projects') == 0
+
+    changed_at = worker.changed_at()
+    version = other_worker.bump()
+    assert worker.version() == version
+    assert worker.changed_at() > changed_at  # Anche con due modifiche nello stesso secondo
+    assert query_count(client, '/api/projects') > 0
+
+
+def test_file_backend_coalesces_misses_across_workers(app, tmp_path, use_backend):
+    """Chi non ottiene il lock aspetta la risposta costruita dall'altro worker invece di interrogare il DB"""
+    use_backend(FileBackend(str(tmp_path), 'release'))
+    other_worker = FileBackend(str(tmp_path), 'release')
+    builds = []
+    result = {}
+
+    def request():
+        with app.test_request_context('/'):
+            result['body'] = cache.get_cached_body('key', lambda: builds.append(1) or b'local')
+
+    with other_worker.build_lock('key', timeout=1) as acquired:
+        assert acquired
+        thread = threading.Thread(target=request)
+        thread.start()
+        time.sleep(0.1)
+        cached = cache.CachedBody.build(cache.Payload(b'shared'), 'text/html', cache.content_version())
+        other_worker.set('key', cached.to_bytes())
+    thread.join(timeout=5)
+
+    assert result['body'].body == b'shared' and builds == []
+
+
+def test_shared_entries_are_not_pickles(app, tmp_path, use_backend):
+    """Le risposte condivise sono JSON più byte: un file estraneo viene scartato senza eseguire nulla"""
+    worker = use_backend(FileBackend(str(tmp_path / 'cache'), 'release'))
+    with app.test_request_context('/'):
+        built = cache.get_cached_body('key', lambda: cache.Payload(b'body', headers=(('Link', '<x>'),)))
+        assert cache.CachedBody.from_bytes(worker.get('key')) == built
+
+        cache.clear_local()
+        worker.set('key', b'\x80\x04\x95 pickled payload')
+        assert cache.load_shared_body('key', cache.content_version()) is None
+
+
+def test_file_backend_refuses_shared_directory(tmp_path):
+    """Una cartella della cache leggibile o scrivibile da altri utenti viene rifiutata"""
+    path = tmp_path / 'cache'
+    path.mkdir(mode=0o777)
+    os.chmod(path, 0o777)
+    with pytest.raises(CacheBackendError):
+        FileBackend(str(path), 'release')
+    os.chmod(path, 0o700)
+    FileBackend(str(path), 'release').close()
+
+
+def test_redis_backend_broadcasts_version():
+    """Il backend Redis propaga il nuovo numero di versione agli altri worker via pub/sub"""
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    worker = RedisBackend('', 'test:', 'release', 60, client=fakeredis.FakeRedis(server=server))
+    other_worker = RedisBackend('', 'test:', 'release', 60, client=fakeredis.FakeRedis(server=server))
+    try:
+        worker.version()  # Avvia l'ascolto del canale
+        time.sleep(0.2)
+        version = other_worker.bump()
+
+        deadline = time.monotonic() + 3
+        while worker.version() != version and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert worker.version() == version
+        assert worker.changed_at() == other_worker.changed_at()
+
+        other_worker.set('home', b'body')
+        assert worker.get('home') == b'body'
+    finally:
+        worker.close()
+        other_worker.close()
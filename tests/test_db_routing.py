@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+import db_routing
+from config import config
+from models import db
+
+
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch):
+    """Copia su file del database di test registrata come replica, con un titolo del profilo diverso"""
+    path = tmp_path / 'replica.db'
+    with app.app_context():
+        source = db.engine.raw_connection()
+        target = sqlite3.connect(path)
+        source.driver_connection.backup(target)
+        target.execute("UPDATE profile SET title = 'Dalla replica'")
+        target.commit()
+        target.close()
+        source.close()
+
+        engine = create_engine(f"sqlite:///{path}")
+        db.engines['replica1'] = engine
+    monkeypatch.setattr(db_routing, 'REPLICA_BINDS', ('replica1',))
+    monkeypatch.setattr(config, 'DB_REPLICA_MAX_LAG', 0)
+    yield
+    with app.app_context():
+        db.engines.pop('replica1')
+    engine.dispose()
+
+
+def profile_title(client):
+    return client.get('/api/profile').get_json()['title']
+
+
+def test_public_reads_use_replica(client, replica):
+    """Le GET pubbliche leggono dalla replica, il pannello admin dal primario"""
+    assert profile_title(client) == 'Dalla replica'
+
+    response = client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    assert 'Il ponte tra sistemi e sviluppo web' in client.get('/admin/profile').get_data(as_text=True)
+
+
+def test_writer_reads_own_writes(app, client, auth_client, replica):
+    """Dopo una scrittura il browser che l'ha fatta legge dal primario per DB_REPLICA_STICKY_SECONDS"""
+    response = auth_client.put('/api/profile', json={'title': 'Nuovo titolo'})
+    assert response.status_code == 200
+    assert db_routing.STICKY_COOKIE in response.headers['Set-Cookie']
+    assert profile_title(auth_client) == 'Nuovo titolo'
+
+    anonymous = app.test_client()
+    assert profile_title(anonymous) == 'Nuovo titolo'  # Body cached from the primary
+
+
+def test_primary_used_right_after_content_change(app, replica, monkeypatch):
+    """Subito dopo una modifica dei contenuti la cache viene ricostruita dal primario"""
+    monkeypatch.setattr(config, 'DB_REPLICA_MAX_LAG', 60)
+    assert profile_title(app.test_client()) != 'Dalla replica'
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import gzip
+import json
+
+import export_static
+from config import config
+
+
+def test_export_writes_pages_api_and_assets(app, client, tmp_path):
+    """L'export contiene home, API, asset statici e le varianti precompresse"""
+    export_static.export_site(app, str(tmp_path))
+
+    index = (tmp_path / 'index.html').read_bytes()
+    assert index == client.get('/').get_data()
+    assert gzip.decompress((tmp_path / 'index.html.gz').read_bytes()) == index
+
+    projects = json.loads((tmp_path / 'api' / 'projects.json').read_text())
+    assert len(projects) == 3
+    assert (tmp_path / 'api' / 'profile.json').exists()
+    assert (tmp_path / 'static' / 'css' / 'styles.css').exists()
+    assert (tmp_path / 'static' / 'css' / 'styles.css.gz').exists()
+    assert '?v=' in index.decode()
+
+
+def test_reexport_after_admin_write(app, auth_client, tmp_path):
+    """Dopo una modifica dall'admin l'export viene rigenerato"""
+    export_static.export_site(app, str(tmp_path))
+    auth_client.post('/admin/skills/add', data={'name': 'Rust', 'icon_class': 'fab fa-rust',
+                                                'display_order': '9', 'is_active': 'on'})
+
+    export_static.schedule_export(app, str(tmp_path)).result(timeout=30)
+    assert 'Rust' in (tmp_path / 'api' / 'skills.json').read_text()
+    assert 'fa-rust' in (tmp_path / 'index.html').read_text()
+
+
+def test_export_leaves_multi_page_listings_to_flask(app, client, tmp_path, monkeypatch):
+    """Le liste esportate coincidono con la prima pagina servita da Flask; se c'è una pagina
+    successiva il file non viene scritto, così nginx passa la richiesta a Flask con l'header Link"""
+    assert export_static.export_site(app, str(tmp_path)) == []
+    assert (tmp_path / 'api' / 'projects.json').read_bytes() == client.get('/api/projects').get_data()
+
+    monkeypatch.setattr(config, 'API_PAGE_SIZE', 2)
+    assert export_static.export_site(app, str(tmp_path)) == ['/api/skills', '/api/projects']
+    assert not (tmp_path / 'api' / 'projects.json').exists()
+    assert not (tmp_path / 'api' / 'projects.json.gz').exists()
+    assert (tmp_path / 'api' / 'profile.json').exists()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import gzip
+
+from sqlalchemy import event
+
+from cache import bump_content_version
+from models import db
+
+
+def count_queries(app, client, url='/'):
+    """Esegue una GET e restituisce il numero di query SQL eseguite"""
+    queries = []
+
+    def count(*args):
+        queries.append(1)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def test_home_reads_content_once_per_version(app, client):
+    """La home legge i contenuti dal database solo dopo una modifica"""
+    assert count_queries(app, client) > 0
+    assert count_queries(app, client) == 0
+
+    bump_content_version()
+    assert count_queries(app, client) > 0
+    assert 'Il ponte tra sistemi e sviluppo web' in client.get('/').get_data(as_text=True)
+
+
+def test_home_precompressed_with_etag(client):
+    """La home è servita precompressa con un ETag e risponde 304 alle richieste condizionali"""
+    plain = client.get('/')
+    compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+
+    response = client.get('/', headers={'If-None-Match': compressed.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
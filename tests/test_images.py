@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import io
+import os
+
+import pytest
+
+import images
+from cache import content_version
+from config import config
+
+pytestmark = pytest.mark.skipif(not images.available(), reason="Pillow non installato")
+
+
+@pytest.fixture
+def upload_dir(app, tmp_path, monkeypatch):
+    """Cartella static temporanea per gli upload"""
+    static = tmp_path / 'static'
+    (static / 'img').mkdir(parents=True)
+    monkeypatch.setattr(app, 'static_folder', str(static))
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(static / 'img'))
+    return static / 'img'
+
+
+def make_jpeg(width, height):
+    from PIL import Image
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'Fotocamera di prova'  # Make
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'JPEG', exif=exif)
+    buffer.seek(0)
+    return buffer
+
+
+def test_upload_generates_variants(auth_client, upload_dir):
+    """L'upload produce un master WebP senza EXIF, le varianti e il srcset nella home"""
+    from PIL import Image
+
+    response = auth_client.post('/admin/profile/edit', data={
+        'title': 'Titolo', 'lead_text': 'Testo', 'years_experience': '7',
+        'profile_image_file': (make_jpeg(2000, 1000), 'foto.jpg'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    version = content_version()
+    images.wait_for_variants(timeout=30)
+    assert content_version() == version  # Only the pages embedding the manifest are re-rendered
+
+    masters = [name for name in os.listdir(upload_dir) if name.endswith('.webp')]
+    assert len(masters) == 1
+    with Image.open(upload_dir / masters[0]) as master:
+        assert master.size == (max(config.IMAGE_VARIANT_WIDTHS), 640)
+        assert not master.getexif()
+
+    variants = os.listdir(upload_dir / 'variants' / masters[0][:-5])
+    assert '320.webp' in variants and 'manifest.json' in variants
+
+    page = auth_client.get('/').get_data(as_text=True)
+    assert 'srcset=' in page and '320w' in page
+
+
+def test_upload_rejects_invalid_image(auth_client, upload_dir):
+    """Un file che non è un'immagine non viene salvato"""
+    response = auth_client.post('/admin/profile/edit', data={
+        'profile_image_file': (io.BytesIO(b'not an image'), 'foto.png'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert os.listdir(upload_dir) == []
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+from datetime import datetime
+
+import pytest
+
+import json_provider
+from json_provider import FastJSONProvider
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def provider(request, app, monkeypatch):
+    """Provider JSON dell'applicazione, con orjson e con il solo modulo json della libreria standard"""
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    return FastJSONProvider(app)
+
+
+def test_output_matches_default_provider(provider):
+    """Chiavi ordinate e date HTTP come il provider predefinito di Flask, con o senza orjson"""
+    data = {'b': [1, 2.5, None, True], 'a': 'àèì', 'c': datetime(2024, 5, 1, 12, 30)}
+    encoded = provider.dumps_bytes(data)
+    assert encoded.index(b'"a"') < encoded.index(b'"b"') < encoded.index(b'"c"')
+    assert provider.loads(encoded) == {'a': 'àèì', 'b': [1, 2.5, None, True], 'c': 'Wed, 01 May 2024 12:30:00 GMT'}
+    # Gli interi oltre i 64 bit passano al modulo json della libreria standard
+    assert provider.loads(provider.dumps({'n': 2 ** 70})) == {'n': 2 ** 70}
+
+
+def test_app_uses_fast_provider(app, client):
+    """jsonify e le risposte dell'API passano dal provider dell'applicazione"""
+    assert isinstance(app.json, FastJSONProvider)
+    assert client.get('/api/skills?limit=x').get_json() == {'message': "'limit' must be an integer"}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import inspect
+
+from cache import content_version
+from init_db import BASELINE_REVISION, init_database
+from models import db, User
+
+LISTING_INDEXES = {
+    'skills': ['is_active', 'display_order'],
+    'projects': ['is_published', 'display_order'],
+    'project_tags': ['project_id', 'display_order'],
+    'social_links': ['is_active', 'display_order'],
+}
+
+
+def drop_everything():
+    db.drop_all()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+
+
+def indexed_columns(table):
+    return [index['column_names'] for index in inspect(db.engine).get_indexes(table)]
+
+
+def test_migrations_create_listing_indexes(app):
+    """Le migrazioni creano da zero lo schema con gli indici delle liste"""
+    with app.app_context():
+        drop_everything()
+    init_database()
+
+    with app.app_context():
+        for table, columns in LISTING_INDEXES.items():
+            assert columns in indexed_columns(table)
+        assert db.session.query(User.query.exists()).scalar()
+
+
+def test_existing_database_is_upgraded_in_place(app):
+    """Un database creato prima delle migrazioni viene aggiornato senza perdere i dati"""
+    with app.app_context():
+        downgrade(revision=BASELINE_REVISION)
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP TABLE alembic_version')
+            users = connection.exec_driver_sql('SELECT COUNT(*) FROM users').scalar()
+        assert ['is_active', 'display_order'] not in indexed_columns('skills')
+
+    init_database()
+
+    with app.app_context():
+        assert ['is_active', 'display_order'] in indexed_columns('skills')
+        assert User.query.count() == users
+        upgrade()  # Already at the latest revision
+
+
+def test_init_invalidates_cached_responses(app):
+    """init_db.py invalida le risposte in cache, anche quelle salvate dai backend condivisi"""
+    version = content_version()
+    init_database()
+    assert content_version() > version
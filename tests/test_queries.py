@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import json
+
+from cache import bump_content_version
+from config import Config, config
+from models import db, Project, ProjectTag
+from routes import api
+
+
+def add_projects(app, count, tags_per_project=3):
+    """Aggiunge progetti pubblicati con alcuni tag ciascuno"""
+    with app.app_context():
+        for i in range(count):
+            project = Project(title=f"Progetto {i}", description="Descrizione", display_order=100 + i)
+            project.tags = [ProjectTag(name=f"Tag {n}", display_order=n) for n in range(tags_per_project)]
+            db.session.add(project)
+        db.session.commit()
+    bump_content_version()
+
+
+def query_count(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return int(response.headers['X-Query-Count'])
+
+
+def test_home_query_count_is_constant(app, client):
+    """Il numero di query della home non deve crescere con il numero di progetti"""
+    baseline = query_count(client, '/')
+    add_projects(app, 20)
+    assert query_count(client, '/') == baseline
+
+
+def test_home_served_from_cache(client):
+    """Dopo il primo caricamento la home non esegue query e risponde 304 con l'ETag"""
+    first = client.get('/')
+    assert query_count(client, '/') == 0
+
+    response = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+
+
+def test_api_projects_query_count_is_constant(app, client):
+    """GET /api/projects carica i tag in un'unica query indipendentemente dai progetti"""
+    baseline = query_count(client, '/api/projects')
+    add_projects(app, 20)
+    assert query_count(client, '/api/projects') == baseline
+
+
+def test_tags_ordered_by_database(app, client):
+    """I tag arrivano già ordinati per display_order"""
+    with app.app_context():
+        project = Project(title="Ordine", description="Tag invertiti", display_order=0)
+        project.tags = [ProjectTag(name="B", display_order=2), ProjectTag(name="A", display_order=1)]
+        db.session.add(project)
+        db.session.commit()
+
+    projects = client.get('/api/projects').get_json()
+    tags = next(p['tags'] for p in projects if p['title'] == "Ordine")
+    assert [tag['name'] for tag in tags] == ["A", "B"]
+
+
+def test_api_projects_built_without_orm_objects(app):
+    """Le liste dell'API vengono serializzate dalle righe senza caricare oggetti ORM"""
+    add_projects(app, 20)
+    with app.test_request_context('/api/projects?published=all&limit=200'):
+        payload = api.build_projects_json(api.projects_params())
+        assert len(db.session.identity_map) == 0
+    assert len(json.loads(payload.body)) == 23
+
+
+def test_mariadb_pool_options():
+    """Le opzioni del pool vengono costruite dalla configurazione"""
+    options = Config(DB_ENGINE='mariadb', DB_POOL_SIZE=2, DB_POOL_RECYCLE=600).SQLALCHEMY_ENGINE_OPTIONS
+    assert options['pool_size'] == 2
+    assert options['pool_recycle'] == 600
+    assert options['pool_pre_ping'] is True
+    assert options['connect_args']['read_timeout'] == 30
+
+
+def test_dashboard_stats_single_query(app, auth_client):
+    """Le statistiche della dashboard usano una sola query e restano in cache fino alla modifica successiva"""
+    auth_client.get('/admin/')  # Carica l'utente nella cache
+    bump_content_version()
+    assert query_count(auth_client, '/admin/') == 1
+    assert query_count(auth_client, '/admin/') == 0
+
+    add_projects(app, 5, tags_per_project=4)
+    response = auth_client.get('/admin/')
+    assert int(response.headers['X-Query-Count']) == 1
+    page = response.get_data(as_text=True)
+    assert '>8</h2>' in page  # 3 progetti iniziali + 5
+    assert '>35</h4>' in page and 'max 7' in page  # 15 tag di init_db.py + 5 * 4
+
+
+def test_dashboard_upload_usage_not_tied_to_content_version(app, auth_client, tmp_path, monkeypatch):
+    """Lo spazio upload viene rimisurato dopo UPLOAD_USAGE_TTL anche senza modifiche ai contenuti"""
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(config, 'UPLOAD_USAGE_TTL', 0)
+    assert '>0 file<' in auth_client.get('/admin/').get_data(as_text=True)
+
+    (tmp_path / 'variants').mkdir()
+    (tmp_path / 'variants' / '320.webp').write_bytes(b'x' * 1024)
+    assert '>1 file<' in auth_client.get('/admin/').get_data(as_text=True)
+
+
+def test_server_timing_and_request_histograms(app, client, auth_client):
+    """Server-Timing riporta query, tempi di DB, serializzazione e compressione, aggregati su /admin/metrics"""
+    from instrumentation import request_metrics
+    request_metrics.reset()
+
+    timing = client.get('/api/projects').headers['Server-Timing']
+    assert 'db;dur=' in timing and 'desc="2 queries"' in timing
+    assert 'serialize;dur=' in timing and 'compress;dur=' in timing and 'app;dur=' in timing
+
+    timing = client.get('/api/projects').headers['Server-Timing']
+    assert 'db;' not in timing and 'compress;' not in timing  # Servita dalla cache
+
+    bump_content_version()
+    assert 'render;dur=' in client.get('/').headers['Server-Timing']
+
+    metrics = auth_client.get('/admin/metrics').get_data(as_text=True)
+    assert 'portfolio_request_duration_seconds_count{endpoint="api.get_projects"} 2' in metrics
+    assert 'portfolio_request_queries_bucket{endpoint="api.get_projects",le="2"} 2' in metrics
+    assert 'portfolio_request_render_seconds_count{endpoint="route_home.home"} 1' in metrics
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import gzip
+from datetime import datetime
+
+from cache import bump_content_version, clear_local
+from config import config
+from models import db, ContentRemoval, Project
+
+
+def test_sitemap_lastmod_follows_content(app, client, auth_client):
+    """Il lastmod della sitemap segue l'ultima modifica di profilo e progetti, anche quando un progetto viene nascosto"""
+    response = client.get('/sitemap.xml')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/xml'
+    assert f"<loc>{config.SITE_URL}/</loc>" in response.get_data(as_text=True)
+
+    with app.app_context():
+        for project in Project.query.all():
+            project.updated_at = datetime(2020, 1, 1)
+        db.session.commit()
+    auth_client.post('/admin/projects/1/edit', data={'title': 'Nuovo titolo', 'is_published': 'on'})
+
+    response = client.get('/sitemap.xml')
+    with app.app_context():
+        updated_at = db.session.get(Project, 1).updated_at.replace(microsecond=0)
+    assert f"<lastmod>{updated_at.isoformat()}+00:00</lastmod>" in response.get_data(as_text=True)
+    assert response.last_modified.replace(tzinfo=None) == updated_at
+
+    # Unpublishing takes the project out of the published rows: the removal time is stored
+    auth_client.post('/admin/projects/2/edit', data={'title': 'Nascosto'})
+    response = client.get('/sitemap.xml')
+    with app.app_context():
+        removed_at = db.session.get(ContentRemoval, 1).removed_at.replace(microsecond=0)
+    assert removed_at >= updated_at
+    assert f"<lastmod>{removed_at.isoformat()}+00:00</lastmod>" in response.get_data(as_text=True)
+
+
+def test_batch_delete_records_removal(app, auth_client):
+    """Anche l'eliminazione di un progetto pubblicato tramite /api/batch registra la rimozione"""
+    response = auth_client.post('/api/batch', json=[{'op': 'delete', 'type': 'project', 'id': 3}])
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(ContentRemoval, 1) is not None
+
+
+def test_sitemap_lastmod_survives_restart(client):
+    """Un riavvio (cache vuota, nuova versione) non cambia lastmod né ETag della sitemap"""
+    before = client.get('/sitemap.xml')
+    clear_local()
+    bump_content_version()
+    after = client.get('/sitemap.xml', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 304
+
+
+def test_sitemap_is_cached_with_etag_and_gzip(client):
+    """La sitemap è servita precompressa e le richieste condizionali ricevono 304"""
+    response = client.get('/sitemap.xml', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'<urlset' in gzip.decompress(response.data)
+
+    cached = client.get('/sitemap.xml', headers={'Accept-Encoding': 'gzip',
+                                                 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert cached.headers['X-Query-Count'] == '0'
+
+
+def test_robots_points_to_sitemap(client):
+    """robots.txt indica la sitemap con l'URL assoluto del sito"""
+    body = client.get('/robots.txt').get_data(as_text=True)
+    assert f"Sitemap: {config.SITE_URL}/sitemap.xml" in body
+    assert 'Disallow: /admin/' in body
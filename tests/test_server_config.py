@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import pytest
+
+import server_config
+from config import Config
+
+
+def test_production_settings_follow_cpu_count(monkeypatch):
+    """In produzione worker e thread derivano dalle CPU e dal pool, con riciclo e jitter"""
+    monkeypatch.setattr(server_config, 'cpu_count', lambda: 4)
+    cfg = Config(SERVER_PROFILE='production', DEBUG=False, DB_POOL_SIZE=3, DB_MAX_OVERFLOW=2, CACHE_BACKEND='file')
+
+    hypercorn = server_config.server_settings('hypercorn', cfg)
+    assert hypercorn['workers'] == 4 and not hypercorn['use_reloader']
+    assert hypercorn['max_requests'] == 10000 and hypercorn['max_requests_jitter'] == 1000
+
+    gunicorn = server_config.server_settings('gunicorn', cfg)
+    assert gunicorn['workers'] == 9 and gunicorn['threads'] == 5 and gunicorn['worker_class'] == 'gthread'
+    assert gunicorn['keepalive'] == 5 and gunicorn['backlog'] == 2048 and gunicorn['graceful_timeout'] == 30
+
+    single_thread = Config(SERVER_WORKERS=2, SERVER_THREADS=1, CACHE_BACKEND='file')
+    assert server_config.server_settings('gunicorn', single_thread)['worker_class'] == 'sync'
+
+
+@pytest.mark.parametrize('options', [{'DEBUG': True}, {'SERVER_RELOAD': True}])
+def test_production_refuses_debug_and_reload(options):
+    """Il profilo di produzione non si avvia con debug o reload, quello di sviluppo sì"""
+    with pytest.raises(server_config.ServerConfigError):
+        server_config.server_settings('hypercorn', Config(SERVER_PROFILE='production', **options))
+
+    settings = server_config.server_settings('hypercorn', Config(SERVER_PROFILE='development', **options))
+    assert settings['workers'] == 1 and settings['max_requests'] is None
+
+
+def test_production_refuses_local_cache_with_several_workers(monkeypatch, caplog):
+    """Più worker richiedono una versione dei contenuti condivisa: in produzione l'avvio fallisce"""
+    monkeypatch.setattr(server_config, 'cpu_count', lambda: 4)
+    with pytest.raises(server_config.ServerConfigError, match='CACHE_BACKEND'):
+        server_config.server_settings('hypercorn', Config(SERVER_PROFILE='production', CACHE_BACKEND='local'))
+
+    settings = server_config.server_settings('hypercorn', Config(SERVER_PROFILE='production', SERVER_WORKERS=1,
+                                                                 CACHE_BACKEND='local'))
+    assert settings['workers'] == 1
+
+    with caplog.at_level('WARNING', logger='server_config'):
+        server_config.server_settings('gunicorn', Config(SERVER_PROFILE='development', SERVER_WORKERS=3,
+                                                         CACHE_BACKEND='local'))
+    assert 'CACHE_BACKEND=local' in caplog.text
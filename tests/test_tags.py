@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import db, Project, ProjectTag
+
+
+def test_parse_tags_input():
+    """Il formato del form admin viene convertito in tag ordinati"""
+    assert ProjectTag.parse_input("Python:bg-info, Flask ,, ") == [
+        {'name': 'Python', 'color_class': 'bg-info', 'display_order': 0},
+        {'name': 'Flask', 'color_class': 'bg-primary', 'display_order': 1},
+    ]
+
+
+def test_update_project_keeps_unchanged_tags(auth_client):
+    """Aggiornando i tag vengono scritte solo le differenze"""
+    before = {tag['name']: tag for tag in auth_client.get('/api/projects?tag=Bash').get_json()[0]['tags']}
+
+    response = auth_client.put('/api/projects/1', json={'tags': [
+        {'name': 'Bash', 'color_class': 'bg-primary', 'display_order': 1},
+        {'name': 'Linux', 'color_class': 'bg-dark', 'display_order': 2},
+        {'name': 'MariaDB', 'color_class': 'bg-success', 'display_order': 3},
+    ]})
+    after = {tag['name']: tag for tag in response.get_json()['tags']}
+
+    assert after['Bash'] == before['Bash']
+    assert after['Linux']['id'] == before['Linux']['id']
+    assert after['Linux']['color_class'] == 'bg-dark'
+    assert list(after) == ['Bash', 'Linux', 'MariaDB']
+
+
+def test_update_project_with_same_tags_skips_tag_writes(auth_client):
+    """Se i tag non cambiano non viene eseguita nessuna scrittura sui tag"""
+    tags = auth_client.get('/api/projects?tag=Bash').get_json()[0]['tags']
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        response = auth_client.put('/api/projects/1', json={'tags': tags})
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+
+    assert response.get_json()['tags'] == tags
+    assert not [sql for sql in statements if 'project_tags' in sql and not sql.startswith('SELECT')]
+
+
+def test_tag_changes_move_updated_at(app, auth_client):
+    """Aggiungere, rinominare o togliere un tag aggiorna updated_at del progetto"""
+    def updated_at():
+        with app.app_context():
+            return db.session.get(Project, 1).updated_at
+
+    before = updated_at()
+    response = auth_client.put('/api/projects/1', json={'tags': [{'name': 'Solo tag'}]})
+    assert response.status_code == 200
+    assert updated_at() > before
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+import shutil
+
+import pytest
+from flask import Flask
+
+import cache
+import vendor_assets
+from cache import bump_content_version
+from models import db, ProjectTag
+
+BOOTSTRAP = (':root{--bs-blue:#0d6efd}body{margin:0}.btn{padding:1rem}.btn-unused{color:red}'
+             '.bg-primary{color:blue}.bg-danger{color:red}.navbar .nav-link:not(.disabled){color:#fff}'
+             '@media (min-width:992px){.navbar-expand-lg{display:flex}.offcanvas{display:none}}'
+             '@keyframes spinner-border{to{transform:rotate(1turn)}}.spinner-border{animation:spinner-border 1s}')
+ANIMATE = ('@keyframes fadeInLeft{0%{opacity:0}to{opacity:1}}.animate__fadeInLeft{animation-name:fadeInLeft}'
+           '@keyframes bounce{0%{opacity:0}}.animate__bounce{animation-name:bounce}')
+FONTAWESOME = ('@font-face{font-family:"Font Awesome 6 Brands";src:url(../webfonts/fa-brands-400.woff2) '
+               'format("woff2"),url(../webfonts/fa-brands-400.ttf) format("truetype")}'
+               '.fab{font-family:"Font Awesome 6 Brands"}.fa-linux:before{content:"\\f17c"}'
+               '.fa-windows:before{content:"\\f17a"}')
+
+
+@pytest.fixture
+def vendor_dirs(app, tmp_path, monkeypatch):
+    """Sorgenti finte delle CDN e cartella static temporanea"""
+    source = tmp_path / 'vendor'
+    (source / 'webfonts').mkdir(parents=True)
+    (source / 'bootstrap.min.css').write_text(BOOTSTRAP)
+    (source / 'animate.min.css').write_text(ANIMATE)
+    (source / 'fontawesome.min.css').write_text(FONTAWESOME)
+    (source / 'bootstrap.bundle.min.js').write_text('/* bootstrap */')
+    (source / 'webfonts' / 'fa-brands-400.woff2').write_bytes(b'font')
+
+    static = tmp_path / 'static'
+    shutil.copytree(app.static_folder, static, ignore=shutil.ignore_patterns('img'))
+    monkeypatch.setattr(app, 'static_folder', str(static))
+    monkeypatch.setattr(vendor_assets, 'subset_font', lambda path, codepoints: open(path, 'rb').read())
+    return source, static
+
+
+def test_purge_keeps_only_used_selectors():
+    """Vengono tenuti solo i selettori, i keyframes e i font effettivamente usati"""
+    rules = vendor_assets.purge_stylesheet(BOOTSTRAP + ANIMATE + FONTAWESOME,
+                                           {'btn', 'navbar', 'nav-link', 'animate__fadeInLeft', 'fab', 'fa-linux'})
+    css = vendor_assets.serialize_css(rules)
+
+    assert ':root{' in css and 'body{' in css and '.btn{' in css
+    assert '.navbar .nav-link:not(.disabled)' in css
+    assert '.btn-unused' not in css and '.offcanvas' not in css and '@media' not in css
+    assert '@keyframes fadeInLeft' in css and '@keyframes bounce' not in css
+    assert '@keyframes spinner-border' not in css
+    assert '@font-face' in css and '.fa-windows' not in css
+    assert vendor_assets.glyph_codepoints(rules) == {0xf17c}
+
+
+def test_home_uses_self_hosted_bundle(app, client, vendor_dirs):
+    """La home inline il CSS critico e carica il bundle locale al posto delle CDN"""
+    source, static = vendor_dirs
+    with app.app_context():
+        classes = vendor_assets.database_classes()
+    vendor_assets.build(str(static), source_dir=str(source), extra_classes=classes)
+    bump_content_version()
+
+    page = client.get('/').get_data(as_text=True)
+    assert '<style>' in page and 'vendor/site.css?v=' in page and 'vendor/bootstrap.bundle.min.js' in page
+    assert 'cdnjs.cloudflare.com' not in page
+
+    site = (static / 'vendor' / 'site.css').read_text()
+    assert '.bg-primary{' in site and '.bg-danger' not in site
+    assert 'url(/static/vendor/fonts/fa-brands-400.woff2?v=' in site and '.ttf' not in site
+    assert (static / 'vendor' / 'fonts' / 'fa-brands-400.woff2').exists()
+
+
+def test_new_database_class_makes_bundle_stale(app, vendor_dirs):
+    """Una classe nuova salvata nel DB richiede di rigenerare il bundle"""
+    source, static = vendor_dirs
+    with app.app_context():
+        vendor_assets.build(str(static), source_dir=str(source), extra_classes=vendor_assets.database_classes())
+        assert not vendor_assets.is_stale(str(static), str(source), vendor_assets.database_classes())
+
+        db.session.add(ProjectTag(project_id=1, name='Rust', color_class='bg-danger', display_order=9))
+        db.session.commit()
+        assert vendor_assets.is_stale(str(static), str(source), vendor_assets.database_classes())
+
+
+def test_refresh_only_after_content_change(app, vendor_dirs, monkeypatch):
+    """Importare l'app non controlla il bundle: lo fa solo una modifica dei contenuti"""
+    source, static = vendor_dirs
+    vendor_assets.build(str(static), source_dir=str(source))
+    submitted = []
+    monkeypatch.setattr(vendor_assets, 'SOURCE_DIR', str(source))
+    monkeypatch.setattr(vendor_assets._executor, 'submit', lambda *args: submitted.append(args))
+    monkeypatch.setattr(cache, '_listeners', [])
+    vendor_assets._refresh_pending.clear()
+
+    other = Flask(__name__, static_folder=str(static))
+    vendor_assets.init_app(other)
+    assert submitted == []
+
+    bump_content_version()
+    assert len(submitted) == 1
+    vendor_assets._refresh_pending.clear()
@@ -0,0 +1,555 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Hersel Giannella
+
+"""
+Self-hosted front-end dependencies
+Downloads Bootstrap, Animate.css and Font Awesome once, purges every selector the
+public templates and the icon/colour classes stored in the database don't use,
+subsets the Font Awesome fonts to the used glyphs and writes static/vendor/:
+critical.css (inlined in the head), site.css (loaded async) and the Bootstrap JS.
+
+Usage: python vendor_assets.py [--no-db] [--source DIR]
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import select, union
+from cache import bump_content_version, on_content_change
+from models import db, Skill, SocialLink, ProjectTag
+import assets
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # fontTools is optional, fonts are then copied whole
+    font_subset = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, 'vendor')
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
+OUTPUT_DIR = 'vendor'  # Relative to the static folder
+
+CDN = 'https://cdnjs.cloudflare.com/ajax/libs'
+SOURCES = {
+    'bootstrap.min.css': f'{CDN}/bootstrap/5.3.0/css/bootstrap.min.css',
+    'bootstrap.bundle.min.js': f'{CDN}/bootstrap/5.3.0/js/bootstrap.bundle.min.js',
+    'animate.min.css': f'{CDN}/animate.css/4.1.1/animate.min.css',
+    'fontawesome.min.css': f'{CDN}/font-awesome/6.4.0/css/all.min.css',
+    'webfonts/fa-brands-400.woff2': f'{CDN}/font-awesome/6.4.0/webfonts/fa-brands-400.woff2',
+    'webfonts/fa-regular-400.woff2': f'{CDN}/font-awesome/6.4.0/webfonts/fa-regular-400.woff2',
+    'webfonts/fa-solid-900.woff2': f'{CDN}/font-awesome/6.4.0/webfonts/fa-solid-900.woff2',
+}
+STYLESHEETS = ('bootstrap.min.css', 'animate.min.css', 'fontawesome.min.css')
+SCRIPT = 'bootstrap.bundle.min.js'
+
+# Templates of the public page; the includes below the fold are left out of the critical CSS
+PUBLIC_TEMPLATES = ('head.html', 'navbar.html', 'index.html', 'macros.html',
+                    'content/about.html', 'content/project.html', 'content/links.html')
+CRITICAL_TEMPLATES = ('head.html', 'navbar.html', 'index.html', 'macros.html')
+SCRIPTS = ('js/core.js',)
+CUSTOM_STYLESHEET = 'css/styles.css'
+
+# Classes toggled at runtime by the Bootstrap JS components used on the page
+SAFELIST = {'show', 'showing', 'hiding', 'collapse', 'collapsing', 'collapsed', 'active', 'fade'}
+
+
+# ============================================================================
+# USED CLASSES
+# ============================================================================
+
+CLASS_ATTR_RE = re.compile(r'class\s*=\s*"([^"]*)"')
+JINJA_RE = re.compile(r'{{.*?}}|{%.*?%}|{#.*?#}', re.S)
+INCLUDE_RE = re.compile(r'{%-?\s*include\b.*?%}', re.S)
+STRING_RE = re.compile(r'"([^"\n]*)"|\'([^\'\n]*)\'')
+CLASS_NAME_RE = re.compile(r'-?[A-Za-z_][\w-]*')
+
+
+def class_tokens(text):
+    return {token for token in re.split(r'[\s.#>+~,:()\[\]]+', text) if CLASS_NAME_RE.fullmatch(token)}
+
+
+def template_classes(source, follow_includes=True):
+    """Classes of the class="..." attributes and of the string literals in Jinja tags"""
+    if not follow_includes:
+        source = INCLUDE_RE.sub('', source)
+    classes = set()
+    for attribute in CLASS_ATTR_RE.findall(source):
+        classes |= class_tokens(JINJA_RE.sub(' ', attribute))
+    for tag in JINJA_RE.findall(source):
+        for double, single in STRING_RE.findall(tag):
+            classes |= class_tokens(double or single)
+    return classes
+
+
+def script_classes(source):
+    """Every class-like token in the string literals of a script"""
+    classes = set()
+    for double, single in STRING_RE.findall(source):
+        classes |= class_tokens(double or single)
+    return classes
+
+
+def read_classes(static_folder, templates, follow_includes=True):
+    classes = set(SAFELIST)
+    for name in templates:
+        with open(os.path.join(TEMPLATE_DIR, name), encoding='utf-8') as f:
+            classes |= template_classes(f.read(), follow_includes)
+    for name in SCRIPTS:
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            classes |= script_classes(f.read())
+    return classes
+
+
+def database_classes():
+    """Icon and colour classes stored in the database (needs an app context)"""
+    query = union(select(Skill.icon_class), select(SocialLink.icon_class), select(ProjectTag.color_class))
+    classes = set()
+    for (value,) in db.session.execute(query):
+        classes |= set((value or '').split())
+    return classes
+
+
+# ============================================================================
+# CSS PURGING
+# ============================================================================
+
+NESTED_AT_RULES = ('@media', '@supports', '@layer', '@container', '@document')
+
+
+def _skip_string(css, i):
+    quote = css[i]
+    i += 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == '\\' else 1
+    return i + 1
+
+
+def _block_end(css, i):
+    """Index just past the '}' closing the block opened before ``i``"""
+    depth = 1
+    while i < len(css):
+        char = css[i]
+        if char in '"\'':
+            i = _skip_string(css, i)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _parse(css, i):
+    rules, start = [], i
+    while i < len(css):
+        char = css[i]
+        if char in '"\'':
+            i = _skip_string(css, i)
+        elif char == ';':
+            rules.append((css[start:i].strip(), None))
+            i += 1
+            start = i
+        elif char == '{':
+            prelude = css[start:i].strip()
+            if prelude.lower().startswith(NESTED_AT_RULES):
+                body, i = _parse(css, i + 1)
+            else:
+                end = _block_end(css, i + 1)
+                body, i = css[i + 1:end - 1], end
+            rules.append((prelude, body))
+            start = i
+        elif char == '}':
+            return rules, i + 1
+        else:
+            i += 1
+    return rules, i
+
+
+def parse_css(css):
+    """Parse a stylesheet into (prelude, body) rules
+
+    ``body`` is the raw declaration text, a list of rules for grouping
+    at-rules (@media, @supports...) or None for statements like @import.
+    """
+    return _parse(re.sub(r'/\*.*?\*/', '', css, flags=re.S), 0)[0]
+
+
+def serialize_css(rules):
+    parts = []
+    for prelude, body in rules:
+        if body is None:
+            parts.append(f"{prelude};")
+        elif isinstance(body, list):
+            parts.append(f"{prelude}{{{serialize_css(body)}}}")
+        else:
+            parts.append(f"{prelude}{{{body}}}")
+    return ''.join(parts)
+
+
+def split_selectors(prelude):
+    """Split a selector list on the commas that are not inside parentheses"""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def _strip_functional(selector):
+    """Drop :not()/:is()/:where()/:has() arguments and attribute selectors"""
+    out, depth = [], 0
+    i = 0
+    while i < len(selector):
+        char = selector[i]
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif depth == 0:
+            out.append(char)
+        i += 1
+    return ''.join(out)
+
+
+SELECTOR_CLASS_RE = re.compile(r'\.((?:\\.|[\w-])+)')
+
+
+def selector_matches(selector, used):
+    """A selector is kept when every class it requires is used"""
+    classes = SELECTOR_CLASS_RE.findall(_strip_functional(selector))
+    return all(re.sub(r'\\(.)', r'\1', name) in used for name in classes)
+
+
+def purge_rules(rules, used):
+    """Drop the style rules none of whose selectors match; @font-face and
+    @keyframes are kept for prune_unreferenced()"""
+    kept = []
+    for prelude, body in rules:
+        if body is None:
+            if not prelude.lower().startswith('@charset'):
+                kept.append((prelude, body))
+        elif isinstance(body, list):
+            children = purge_rules(body, used)
+            if children:
+                kept.append((prelude, children))
+        elif prelude.startswith('@'):
+            kept.append((prelude, body))
+        else:
+            selectors = [s for s in split_selectors(prelude) if selector_matches(s, used)]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return kept
+
+
+def _declarations(rules):
+    for prelude, body in rules:
+        if isinstance(body, list):
+            yield from _declarations(body)
+        elif body is not None and not prelude.lower().startswith(('@font-face', '@keyframes', '@-webkit-keyframes')):
+            yield body
+
+
+def _font_family(body):
+    match = re.search(r'font-family\s*:\s*["\']?([^;"\']+)', body)
+    return match.group(1).strip() if match else None
+
+
+def prune_unreferenced(rules, text):
+    """Drop @keyframes and @font-face not referenced by the kept declarations"""
+    kept = []
+    for prelude, body in rules:
+        lower = prelude.lower()
+        if isinstance(body, list):
+            children = prune_unreferenced(body, text)
+            if children:
+                kept.append((prelude, children))
+            continue
+        if 'keyframes' in lower:
+            name = prelude.split(None, 1)[1].strip() if ' ' in prelude else ''
+            if not re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', text):
+                continue
+        elif lower.startswith('@font-face'):
+            family = _font_family(body)
+            if family and family not in text:
+                continue
+        kept.append((prelude, body))
+    return kept
+
+
+def purge_stylesheet(css, used):
+    rules = purge_rules(parse_css(css), used)
+    return prune_unreferenced(rules, '\n'.join(_declarations(rules)))
+
+
+GLYPH_RE = re.compile(r'(?:content|--fa)\s*:\s*"((?:\\.|[^"\\])*)"')
+
+
+def glyph_codepoints(rules):
+    """Codepoints emitted by the content: declarations of the kept rules"""
+    codepoints = set()
+    for body in _declarations(rules):
+        for value in GLYPH_RE.findall(body):
+            for escape, char in re.findall(r'\\([0-9a-fA-F]{1,6})\s?|(\\.|.)', value):
+                if escape:
+                    codepoints.add(int(escape, 16))
+                elif char:
+                    codepoints.add(ord(char[-1]))
+    return codepoints
+
+
+# ============================================================================
+# FONTS
+# ============================================================================
+
+FONT_SRC_RE = re.compile(r'url\(\s*["\']?([^)"\']+)["\']?\s*\)\s*(?:format\(\s*["\']?([\w-]+)["\']?\s*\))?')
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def subset_font(source, codepoints):
+    """WOFF2 bytes of ``source`` limited to ``codepoints`` (the whole font without fontTools)"""
+    if font_subset is None:
+        with open(source, 'rb') as f:
+            return f.read()
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = font_subset.load_font(source, options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    font_subset.save_font(font, buffer, options)
+    return buffer.getvalue()
+
+
+def rewrite_font_faces(rules, source_dir, static_folder, static_url_path, codepoints, written=None):
+    """Point the kept @font-face rules at subset WOFF2 copies under static/vendor/fonts"""
+    written = {} if written is None else written
+    rewritten = []
+    for prelude, body in rules:
+        if isinstance(body, list):
+            rewritten.append((prelude, rewrite_font_faces(body, source_dir, static_folder,
+                                                          static_url_path, codepoints, written)))
+            continue
+        if body is None or not prelude.lower().startswith('@font-face'):
+            rewritten.append((prelude, body))
+            continue
+
+        src = None
+        for url, fmt in FONT_SRC_RE.findall(body):
+            name = os.path.basename(url.split('?')[0].split('#')[0])
+            source = os.path.join(source_dir, 'webfonts', name)
+            if name.endswith('.woff2') and os.path.exists(source):
+                if name not in written:
+                    rel = f"{OUTPUT_DIR}/fonts/{name}"
+                    _write_atomic(os.path.join(static_folder, rel), subset_font(source, codepoints))
+                    digest = assets.manifest.get(static_folder, rel).digest
+                    written[name] = f'url({static_url_path}/{rel}?v={digest}) format("woff2")'
+                src = written[name]
+                break
+        if src is None:
+            continue  # Only formats we don't ship: drop the face
+        body = re.sub(r'src\s*:[^;}]*', f'src:{src}', body)
+        rewritten.append((prelude, body))
+    return rewritten
+
+
+# ============================================================================
+# BUNDLE
+# ============================================================================
+
+def bundle_path(static_folder):
+    return os.path.join(static_folder, OUTPUT_DIR, 'bundle.json')
+
+
+def download_sources(source_dir=SOURCE_DIR, force=False):
+    """Fetch the CDN files that are not cached in ``source_dir`` yet"""
+    for name, url in SOURCES.items():
+        path = os.path.join(source_dir, name)
+        if os.path.exists(path) and not force:
+            continue
+        logger.info("Downloading %s", url)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            _write_atomic(path, response.read())
+
+
+def input_paths(static_folder, source_dir):
+    paths = [os.path.join(TEMPLATE_DIR, name) for name in PUBLIC_TEMPLATES]
+    paths += [os.path.join(static_folder, name) for name in SCRIPTS + (CUSTOM_STYLESHEET,)]
+    paths += [os.path.join(source_dir, name) for name in SOURCES]
+    return paths
+
+
+def build(static_folder, static_url_path='/static', source_dir=SOURCE_DIR, extra_classes=()):
+    """Purge, subset and write the bundle; returns the bundle description"""
+    started = time.time()
+    used = read_classes(static_folder, PUBLIC_TEMPLATES) | set(extra_classes)
+    critical_used = read_classes(static_folder, CRITICAL_TEMPLATES, follow_includes=False)
+    output = os.path.join(static_folder, OUTPUT_DIR)
+
+    site_rules, critical_rules = [], []
+    for name in STYLESHEETS:
+        with open(os.path.join(source_dir, name), encoding='utf-8') as f:
+            css = f.read()
+        site_rules += purge_stylesheet(css, used)
+        critical_rules += purge_stylesheet(css, critical_used)
+
+    codepoints, fonts = glyph_codepoints(site_rules), {}
+    site_rules = rewrite_font_faces(site_rules, source_dir, static_folder, static_url_path, codepoints, fonts)
+    critical_rules = rewrite_font_faces(critical_rules, source_dir, static_folder, static_url_path,
+                                        codepoints, fonts)
+
+    # The site's own stylesheet goes last in both files so it still overrides the libraries
+    with open(os.path.join(static_folder, CUSTOM_STYLESHEET), encoding='utf-8') as f:
+        custom = serialize_css(parse_css(f.read()))
+
+    _write_atomic(os.path.join(output, 'site.css'), (serialize_css(site_rules) + custom).encode())
+    _write_atomic(os.path.join(output, 'critical.css'), (serialize_css(critical_rules) + custom).encode())
+    shutil.copyfile(os.path.join(source_dir, SCRIPT), os.path.join(output, SCRIPT))
+
+    bundle = {
+        'built_at': started,
+        'classes': sorted(used),
+        'glyphs': len(codepoints),
+        'stylesheet': f"{OUTPUT_DIR}/site.css",
+        'script': f"{OUTPUT_DIR}/{SCRIPT}",
+    }
+    # Written last: its presence means the other files are complete
+    _write_atomic(bundle_path(static_folder), json.dumps(bundle).encode())
+    return bundle
+
+
+def is_stale(static_folder, source_dir=SOURCE_DIR, db_classes=()):
+    """True when an input changed or the database uses a class the bundle purged"""
+    try:
+        with open(bundle_path(static_folder)) as f:
+            bundle = json.load(f)
+    except (OSError, ValueError):
+        return True
+    newest = max((os.stat(path).st_mtime for path in input_paths(static_folder, source_dir)
+                  if os.path.exists(path)), default=0)
+    return newest > bundle['built_at'] or not set(db_classes) <= set(bundle['classes'])
+
+
+# ============================================================================
+# BACKGROUND REFRESH
+# ============================================================================
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vendor')
+_refresh_pending = threading.Event()
+
+
+def _refresh(app):
+    _refresh_pending.clear()
+    try:
+        with app.app_context():
+            db_classes = database_classes()
+            if is_stale(app.static_folder, db_classes=db_classes):
+                build(app.static_folder, app.static_url_path, extra_classes=db_classes)
+                bump_content_version()  # Re-render the pages with the new critical CSS
+    except Exception:
+        logger.exception("Vendor bundle refresh failed")
+
+
+def schedule_refresh(app):
+    """Queue a rebuild check of a built bundle, coalescing the requests made while one is pending"""
+    if not os.path.exists(bundle_path(app.static_folder)) or not os.path.isdir(SOURCE_DIR):
+        return  # No bundle (CDN fallback) or no sources to rebuild it from
+    if not _refresh_pending.is_set():
+        _refresh_pending.set()
+        _executor.submit(_refresh, app)
+
+
+# ============================================================================
+# TEMPLATE HELPER
+# ============================================================================
+
+_bundle_cache = {}
+
+
+def vendor_bundle():
+    """Critical CSS and URLs of the self-hosted bundle, or None to use the CDN"""
+    path = bundle_path(current_app.static_folder)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+
+    cached = _bundle_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            bundle = json.load(f)
+        with open(os.path.join(current_app.static_folder, OUTPUT_DIR, 'critical.css'), encoding='utf-8') as f:
+            bundle['critical_css'] = f.read()
+        cached = (mtime, bundle)
+        _bundle_cache[path] = cached
+    return cached[1]
+
+
+def init_app(app):
+    """Register the template helper and keep a built bundle in sync with the database
+
+    The bundle is only checked after a content change made by this process: importing the
+    app (workers, init_db.py, migrations, the static export) queries nothing. After a deploy
+    ``python vendor_assets.py`` brings it in line with the classes already in the database.
+    """
+    app.jinja_env.globals['vendor_bundle'] = vendor_bundle
+    on_content_change(lambda: schedule_refresh(app))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vendor and purge the front-end dependencies")
+    parser.add_argument('--source', default=SOURCE_DIR, help="Directory of the downloaded CDN files")
+    parser.add_argument('--no-db', action='store_true', help="Only use the classes found in the templates")
+    parser.add_argument('--force-download', action='store_true', help="Download the CDN files again")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    download_sources(args.source, force=args.force_download)
+    static_folder = os.path.join(BASE_DIR, 'static')
+    db_classes = set()
+    if not args.no_db:
+        from app import app
+        with app.app_context():
+            db_classes = database_classes()
+
+    bundle = build(static_folder, source_dir=args.source, extra_classes=db_classes)
+    for name in ('site.css', 'critical.css'):
+        size = os.path.getsize(os.path.join(static_folder, OUTPUT_DIR, name))
+        print(f"✅ {OUTPUT_DIR}/{name}: {size / 1024:.1f} KB")
+    print(f"✅ {bundle['glyphs']} icon glyphs, {len(bundle['classes'])} classes kept")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())